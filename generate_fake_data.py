@@ -1,12 +1,24 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import hashlib
 import shutil
 from datetime import datetime, timedelta
 import random
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "scraper"))
+from partitions import write_manifest
+from backfill import ingest
+from store import PriceStore
+from catalog import write_catalog
+from anomalies import seed_state, WINDOW
+from variants import write_variants, rebuild_unit_prices
+from downsample import update_downsampled
+from publish import publish
+
 DATA_DIR = os.path.join(BASE_DIR, "public", "data")
 PRICES_DIR = os.path.join(DATA_DIR, "prices")
 
@@ -119,120 +131,126 @@ products = [
 
 print("Generating 10 years of fake history...")
 
-data_rows = []
 today = datetime.now()
 # 10 years simulation
 dates_full = [today - timedelta(days=x) for x in range(365 * 10)]
 dates_full.reverse() # Start from 10 years ago
 
-for product in products:
-    name, price, category, unit = product
+tails = []       # Last closes per product (anomaly state)
+last_rows = []   # Latest row per product (meta.json)
+
+
+def product_histories():
+    for product in products:
+        name, price, category, unit = product
+        rows = []
     
-    # --- 1. Random Start Date (Staggered Entry) ---
-    # 70% chance to start from beginning, 30% chance to be introduced later
-    if random.random() > 0.7:
-        # Introduces randomly within the first 7 years
-        days_skip = random.randint(30, 365 * 7)
-        product_dates = dates_full[days_skip:]
-    else:
-        product_dates = dates_full[:]
+        # --- 1. Random Start Date (Staggered Entry) ---
+        # 70% chance to start from beginning, 30% chance to be introduced later
+        if random.random() > 0.7:
+            # Introduces randomly within the first 7 years
+            days_skip = random.randint(30, 365 * 7)
+            product_dates = dates_full[days_skip:]
+        else:
+            product_dates = dates_full[:]
         
-    # --- 2. Random End Date (Discontinued Items) ---
-    # 5% chance to be discontinued
-    active = True
-    if random.random() > 0.95:
-        # Ends randomly within the last 2 years
-        days_cut = random.randint(30, 365 * 2)
-        if days_cut < len(product_dates):
-            product_dates = product_dates[:-days_cut]
-            active = False
-
-    # Skip if no dates left
-    if not product_dates:
-        continue
-
-    # Initial price logic simulation (work backwards from current price or random?)
-    # The original script started at 'price' and walked.
-    # To make 'price' the CURRENT price, it's safer to start randomly and aim for 'price',
-    # OR just start at 'price' - variation and walk forward.
-    # Let's start at roughly price * 0.6 (inflation over 10 years)
-    current_price = int(price * (0.6 + random.uniform(-0.1, 0.1)))
-    
-    # Generate a random "Image Hash" filename
-    img_hash = f"{abs(hash(name))}.webp"
-
-    for date in product_dates:
-        # --- 3. Missing Data (Missing Days) ---
-        # 5% chance of missing data for a specific day
+        # --- 2. Random End Date (Discontinued Items) ---
+        # 5% chance to be discontinued
+        active = True
         if random.random() > 0.95:
+            # Ends randomly within the last 2 years
+            days_cut = random.randint(30, 365 * 2)
+            if days_cut < len(product_dates):
+                product_dates = product_dates[:-days_cut]
+                active = False
+
+        # Skip if no dates left
+        if not product_dates:
             continue
+
+        # Initial price logic simulation (work backwards from current price or random?)
+        # The original script started at 'price' and walked.
+        # To make 'price' the CURRENT price, it's safer to start randomly and aim for 'price',
+        # OR just start at 'price' - variation and walk forward.
+        # Let's start at roughly price * 0.6 (inflation over 10 years)
+        current_price = int(price * (0.6 + random.uniform(-0.1, 0.1)))
+    
+        # Deterministic "Image Hash" filename (Python's hash() is randomized per run)
+        img_hash = f"{hashlib.md5(name.encode()).hexdigest()}.webp"
+
+        for date in product_dates:
+            # --- 3. Missing Data (Missing Days) ---
+            # 5% chance of missing data for a specific day
+            if random.random() > 0.95:
+                continue
             
-        # Random Walk: Price fluctuates
-        change = np.random.randint(-2, 4) # General upward trend
+            # Random Walk: Price fluctuates
+            change = np.random.randint(-2, 4) # General upward trend
         
-        # Occasional big jump
-        if np.random.random() > 0.99:
-            change = np.random.randint(-20, 25)
+            # Occasional big jump
+            if np.random.random() > 0.99:
+                change = np.random.randint(-20, 25)
 
-        current_price += change
-        current_price = max(10, current_price) 
+            current_price += change
+            current_price = max(10, current_price) 
 
-        data_rows.append({
-            "year": date.year, # For partitioning
-            "date": date.strftime("%Y-%m-%d"),
-            "name": name,
-            "price": current_price,
-            "unit": unit,
-            "category": category,
-            "image": img_hash
-        })
+            rows.append({
+                "date": date.strftime("%Y-%m-%d"),
+                # Fake a single scrape run per day (the production cron runs once daily)
+                "scraped_at": date.replace(hour=0, minute=0, second=0, microsecond=0),
+                "name": name,
+                "price": current_price,
+                "unit": unit,
+                "category": category,
+                "image": img_hash
+            })
 
-# Create DataFrame
-df = pd.DataFrame(data_rows)
+        # Only one product's history is in memory at a time
+        history = pd.DataFrame(rows)
+        if history.empty:
+            continue
+        tails.append(history.tail(WINDOW))
+        last_rows.append(history.iloc[-1])
+        yield history
 
-# --- CRITICAL: Match Production Sorting ---
-df = df.sort_values(by=['name', 'date'])
 
 # --- Save Partitioned Parquet ---
-# We generally want 'data.parquet' inside 'year=2024' etc.
-# Pandas partition_cols does not let us control the filename easily (it uses part-xxxx).
-# So we manually iterate and save.
+# Same layout as the scraper: prices/year=YYYY/month=MM/data.parquet, streamed through
+# the backfill importer (sorted by name/date on disk, bounded memory)
 print("Saving partitioned parquet files...")
+ingest(product_histories(), PRICES_DIR)
+print(f"Saved Month Partitions to: {PRICES_DIR}")
 
-years = df['year'].unique()
-for y in years:
-    year_path = os.path.join(PRICES_DIR, f"year={y}")
-    os.makedirs(year_path, exist_ok=True)
-    parquet_file = os.path.join(year_path, "data.parquet")
-    
-    # Filter data for this year
-    df_year = df[df['year'] == y].copy()
-    
-    # Optional: Drop the year column from the file itself if valid, 
-    # but keeping it is fine and helpful for some readers.
-    # The scraper keeps it implicitly or explicitly? 
-    # Scraper adds 'date', 'name' etc. 
-    # Scraper code: df_final.to_parquet(parquet_file, ...)
-    # Scraper does NOT seem to add a 'year' column to the dataframe explicitly before saving,
-    # but it saves into a year folder.
-    # If we want to be EXACTLY like scraper, we can drop 'year' col relative to the file content
-    # if the scraper implementation doesn't have it.
-    # Scraper `scraped_data` has: date, name, price, unit, category, image. NO year.
-    # So we should drop 'year' col from the saved file.
-    
-    df_year_save = df_year.drop(columns=['year'])
-    df_year_save.to_parquet(parquet_file, index=False, compression='snappy')
-    print(f"  > Saved: {parquet_file}")
+# --- Save Manifest ---
+write_manifest(DATA_DIR, PRICES_DIR)
 
-print(f"Saved Year Partitions to: {PRICES_DIR}")
+# --- Seed Anomaly State (last closes per product, like a long-running scraper) ---
+seed_state(pd.concat(tails, ignore_index=True), DATA_DIR)
 
 # --- Save Meta JSON ---
 # Latest entry for each product (filter by the ACTIVE ones first? No, just last available data)
 # Use the last row for each product name
-meta_df = df.drop_duplicates(subset=['name'], keep='last')
+meta_df = pd.DataFrame(last_rows).drop_duplicates(subset=['name'], keep='last')
 meta_df = meta_df[['name', 'category', 'unit', 'image', 'price']]
 meta_json_path = os.path.join(DATA_DIR, "meta.json")
 meta_df.to_json(meta_json_path, orient='records')
 print(f"Saved Meta JSON: {meta_json_path}")
 
+# --- Save Search Catalog ---
+write_catalog(meta_df, DATA_DIR)
+
+# --- Link Pack Sizes + Unit-Price Series ---
+variants = write_variants(meta_df, DATA_DIR)
+linked_history = PriceStore(DATA_DIR).query(
+    "SELECT date, scraped_at, source, name, unit, price FROM daily_prices WHERE list_contains(?, name)",
+    [list(variants["names"])],
+)
+rebuild_unit_prices(linked_history, variants, DATA_DIR)
+
+# --- Downsampled Chart Levels ---
+update_downsampled(DATA_DIR)
+
+# --- Publish Immutable Copies ---
+publish(DATA_DIR)
+
 print("\nFake Data Generation Complete!")
\ No newline at end of file
@@ -0,0 +1,192 @@
+import os
+import json
+import warnings
+import argparse
+import numpy as np
+import pandas as pd
+
+from partitions import DEFAULT_SOURCE
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+
+STATE_FILE = os.path.join("state", "anomaly_state.json")
+ANOMALIES_FILE = "anomalies.parquet"
+
+WINDOW = 28              # Daily closes kept per product
+MIN_HISTORY = 5          # Don't score products with less history than this
+SHOCK_Z = 6.0            # Robust z-score that counts as a price shock (kept, flagged)
+MISREAD_RATIO = 4.0      # price/median beyond x4 or below /4 looks like a misread (quarantined)
+CONFIRM_DAYS = 3         # A "misread" repeated on this many days in a row is a real level shift
+MIN_REL_SPREAD = 0.01    # Floor for the spread (1% of the median), flat series have MAD = 0
+
+
+# --- ANOMALY DETECTION ---
+# Runs on each scrape's new rows before they are merged into the store. The state file
+# keeps the last WINDOW daily closes per product, so scoring only touches the new rows
+# (no history rescan). Each new price gets a robust z-score against the rolling
+# median/MAD of its own product:
+#   - shock:       |z| >= SHOCK_Z, e.g. Eid spikes. Kept and recorded.
+#   - quarantined: also off by MISREAD_RATIO or more, e.g. a dropped digit. Held back from
+#                  the published partitions and recorded.
+#   - level_shift: a quarantined level that came back on CONFIRM_DAYS days in a row is
+#                  accepted (e.g. a real repricing) and the window restarts from it. Several
+#                  runs on the same day count once, so a misread repeated by intraday
+#                  snapshots is not confirmed by them. The rows held back while the shift
+#                  was pending are kept in the state and published along with it.
+
+def load_state(data_dir):
+    path = os.path.join(data_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"window": WINDOW, "products": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state, data_dir):
+    path = os.path.join(data_dir, STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(',', ':'))
+
+
+def product_keys(df):
+    """State key per row: the name for the default source, "<source>:<name>" otherwise."""
+    if 'source' not in df.columns:
+        return df['name']
+    source = df['source'].fillna(DEFAULT_SOURCE)
+    return df['name'].where(source == DEFAULT_SOURCE, source + ":" + df['name'])
+
+
+def score(prices, windows):
+    """Vectorized robust z-scores of `prices` (n) against `windows` (n x WINDOW, NaN padded)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN rows (new products)
+        median = np.nanmedian(windows, axis=1)
+        mad = np.nanmedian(np.abs(windows - median[:, None]), axis=1)
+    spread = np.maximum(1.4826 * mad, MIN_REL_SPREAD * np.abs(median))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (prices - median) / spread
+        ratio = prices / median
+    history = np.sum(~np.isnan(windows), axis=1)
+    return median, mad, z, ratio, history
+
+
+def detect_anomalies(df_new, data_dir):
+    """Score a scrape's rows; return (rows to publish, anomaly rows) and update the state."""
+    state = load_state(data_dir)
+    products = state["products"]
+
+    # One price per product per run (a product listed in two categories is one row)
+    keys = product_keys(df_new)
+    latest = df_new[~keys.duplicated(keep='first')].reset_index(drop=True)
+    latest_keys = product_keys(latest)
+    prices = latest['price'].to_numpy(dtype=float)
+    windows = np.full((len(latest), WINDOW), np.nan)
+    for i, key in enumerate(latest_keys):
+        past = products.get(key, {}).get("prices", [])[-WINDOW:]
+        if past:
+            windows[i, -len(past):] = past
+
+    median, mad, z, ratio, history = score(prices, windows)
+    scored = history >= MIN_HISTORY
+    shock = scored & (np.abs(z) >= SHOCK_Z)
+    misread = shock & ((ratio >= MISREAD_RATIO) | (ratio <= 1 / MISREAD_RATIO))
+
+    kinds = np.where(misread, "quarantined", np.where(shock, "shock", ""))
+    released = []
+    for i, (key, date) in enumerate(zip(latest_keys, latest['date'])):
+        entry = products.setdefault(key, {"prices": [], "last_date": None, "pending": 0})
+        if misread[i]:
+            if entry.get("pending_date") != date:
+                entry["pending"] = entry.get("pending", 0) + 1
+                entry["pending_date"] = date
+            if entry["pending"] < CONFIRM_DAYS:
+                entry.setdefault("pending_rows", []).extend(pending_rows(df_new[keys == key]))
+                continue
+            kinds[i] = "level_shift"
+            # The held-back days were at the new level too: publish them and restart the
+            # window from them
+            held = restore_rows(entry.get("pending_rows", []))
+            if len(held):
+                released.append(held)
+            closes = held.sort_values('scraped_at').drop_duplicates('date', keep='last').sort_values('date')
+            entry["prices"] = closes['price'].astype(float).tolist()
+            entry["last_date"] = closes['date'].iloc[-1] if len(closes) else None
+        entry["pending"] = 0
+        entry.pop("pending_date", None)
+        entry.pop("pending_rows", None)
+        if entry["last_date"] == date and entry["prices"]:
+            entry["prices"][-1] = prices[i]   # Later snapshot of the same day replaces it
+        else:
+            entry["prices"].append(prices[i])
+        entry["prices"] = entry["prices"][-WINDOW:]
+        entry["last_date"] = date
+
+    flagged = latest.assign(median=median, mad=mad, z=z, ratio=ratio, kind=kinds)
+    flagged = flagged[flagged['kind'] != ""]
+    anomalies = flagged[['date', 'scraped_at', 'source', 'name', 'category', 'price', 'median', 'mad', 'z', 'ratio', 'kind']]
+
+    quarantined = set(product_keys(anomalies)[anomalies['kind'] == "quarantined"])
+    df_clean = pd.concat([df_new[~keys.isin(quarantined)], *released], ignore_index=True)
+
+    save_state(state, data_dir)
+    append_anomalies(anomalies, data_dir)
+    print(f"Anomalies: {(kinds == 'shock').sum()} shocks, {len(quarantined)} quarantined, "
+          f"{(kinds == 'level_shift').sum()} level shifts, {sum(len(r) for r in released)} held rows released "
+          f"({int(scored.sum())}/{len(latest)} products scored)")
+    return df_clean, anomalies
+
+
+def pending_rows(rows):
+    """Held-back scrape rows as JSON records for the state file."""
+    return json.loads(rows.to_json(orient='records', date_format='iso'))
+
+
+def restore_rows(records):
+    rows = pd.DataFrame(records, columns=None if records else ['date', 'scraped_at', 'price'])
+    return rows.assign(scraped_at=pd.to_datetime(rows['scraped_at']))
+
+
+def append_anomalies(anomalies, data_dir):
+    """Append to data/anomalies.parquet (small: only flagged rows ever land here)."""
+    path = os.path.join(data_dir, ANOMALIES_FILE)
+    if anomalies.empty and os.path.exists(path):
+        return
+    if os.path.exists(path):
+        anomalies = pd.concat([pd.read_parquet(path), anomalies], ignore_index=True)
+    anomalies = anomalies.assign(source=anomalies['source'].fillna(DEFAULT_SOURCE))
+    anomalies = anomalies.drop_duplicates(subset=['scraped_at', 'source', 'name'], keep='last')
+    anomalies.sort_values(['date', 'name']).to_parquet(path, index=False, compression='snappy')
+
+
+def seed_state(df_history, data_dir):
+    """Build the state from existing daily closes (columns [source,] name, date, price)."""
+    df_history = df_history.assign(key=product_keys(df_history)).sort_values(['key', 'date'])
+    tails = df_history.groupby('key').tail(WINDOW)
+    products = {
+        key: {"prices": group['price'].astype(float).tolist(), "last_date": group['date'].iloc[-1], "pending": 0}
+        for key, group in tails.groupby('key')
+    }
+    save_state({"window": WINDOW, "products": products}, data_dir)
+    print(f"Seeded anomaly state for {len(products)} products")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Anomaly detection state maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("seed", help="Rebuild the rolling state from the last closes in the store")
+    args = parser.parse_args()
+
+    from store import PriceStore
+    store = PriceStore(DATA_DIR)
+    history = store.query("""
+        SELECT source, name, date, price FROM (
+            SELECT source, name, date, price,
+                   row_number() OVER (PARTITION BY source, name ORDER BY date DESC) AS recent
+            FROM daily_prices
+        ) WHERE recent <= ?
+    """, [WINDOW])
+    seed_state(history, DATA_DIR)
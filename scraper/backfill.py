@@ -0,0 +1,297 @@
+import os
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+
+from partitions import (
+    normalize_snapshots, partition_key, partition_file,
+    migrate_year_partitions, write_manifest,
+)
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+PRICES_DIR = os.path.join(DATA_DIR, "prices")
+
+CHUNK_ROWS = 100_000          # Rows read from an input at a time (= size of one sorted run)
+MERGE_MEMORY_ROWS = 400_000   # Rows buffered across all runs of a partition while merging
+MERGE_FAN_IN = 64             # Runs merged (and files open) at once; more take several passes
+ROW_GROUP_ROWS = 128_000      # Rows per Parquet row group in the output
+
+# Store schema of a snapshot row; imports are cast to it
+SCHEMA = pa.schema([
+    ("date", pa.string()),
+    ("scraped_at", pa.timestamp("us")),
+    ("source", pa.string()),
+    ("name", pa.string()),
+    ("price", pa.float64()),
+    ("unit", pa.string()),
+    ("category", pa.string()),
+    ("image", pa.string()),
+])
+# Intermediate runs of a multi-pass merge keep their sort key
+RUN_SCHEMA = SCHEMA.append(pa.field("_key", pa.string()))
+
+
+# --- BACKFILL / IMPORT ---
+# merge_into_partitions() reads whole partitions into pandas, which is fine for a daily
+# scrape but not for a multi-GB historical dump. This importer keeps memory bounded:
+#   1. Inputs (CSV, JSON Lines, Parquet) are read CHUNK_ROWS at a time through pyarrow.
+#      Each chunk is split by month, sorted and spilled to disk as a sorted run.
+#   2. Per month, the runs (plus the existing partition, which wins on duplicates) are
+#      k-way merged a few batches at a time and written out row group by row group.
+#      A dump that is not sorted by date (e.g. exported by product) leaves many runs
+#      per month; they are merged MERGE_FAN_IN at a time into longer runs first.
+# Peak memory is about one chunk while reading and MERGE_MEMORY_ROWS while merging,
+# and at most MERGE_FAN_IN runs are open, whatever the size of the dump.
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of at most ~chunk_rows rows from a CSV, JSON Lines or Parquet file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    # Blocks are in bytes (~100 per price row). Reading from a Python file object without
+    # threads keeps pyarrow from buffering the whole file ahead of the consumer.
+    block_size = chunk_rows * 100
+    with open(path, "rb") as f:
+        if ext in (".json", ".jsonl", ".ndjson"):
+            if f.read(1024).lstrip()[:1] == b"[":
+                raise ValueError(f"{path}: JSON arrays cannot be streamed, convert to JSON Lines first")
+            f.seek(0)
+            reader = pajson.open_json(f, read_options=pajson.ReadOptions(block_size=block_size, use_threads=False))
+        elif ext in (".csv", ".tsv"):
+            reader = pacsv.open_csv(
+                f,
+                read_options=pacsv.ReadOptions(block_size=block_size, use_threads=False),
+                parse_options=pacsv.ParseOptions(delimiter="\t" if ext == ".tsv" else ","),
+                # Keep dates as text ("YYYY-MM-DD" is what the store holds)
+                convert_options=pacsv.ConvertOptions(column_types={"date": pa.string()}),
+            )
+        else:
+            raise ValueError(f"{path}: unsupported input (use .csv, .tsv, .jsonl or .parquet)")
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+def rechunk(frames, chunk_rows=CHUNK_ROWS):
+    """Regroup frames into chunks of chunk_rows rows (the last one may be smaller).
+
+    Small frames (e.g. one per product) are grouped; large ones (a reader block holds
+    as many rows as fit in its byte size) are split.
+    """
+    pending, rows = [], 0
+    for df in frames:
+        start = 0
+        while start < len(df):
+            piece = df.iloc[start:start + chunk_rows - rows]
+            pending.append(piece)
+            rows += len(piece)
+            start += len(piece)
+            if rows >= chunk_rows:
+                yield pd.concat(pending, ignore_index=True)
+                pending, rows = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def conform(df):
+    """Cast one chunk to the store schema (missing optional columns become null)."""
+    if 'name' not in df.columns or 'price' not in df.columns:
+        raise ValueError(f"Input needs at least 'name', 'price' and 'date' or 'scraped_at' (got {list(df.columns)})")
+    if 'date' not in df.columns:
+        df = df.assign(date=pd.to_datetime(df['scraped_at']).dt.strftime("%Y-%m-%d"))
+    elif not pd.api.types.is_string_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date']).dt.strftime("%Y-%m-%d"))
+    df = normalize_snapshots(df.dropna(subset=['date', 'name', 'price']))
+    for column in SCHEMA.names:
+        if column not in df.columns:
+            df[column] = None
+    df = df[SCHEMA.names].astype({"price": "float64"})
+    return df.assign(_key=sort_keys(df))
+
+
+def sort_keys(df):
+    """One sortable string per row: SORT_KEY order, then unit (the snapshot identity).
+
+    "\x00" sorts before any printable character, so comparing these strings orders rows
+    exactly like comparing (source, name, date, scraped_at, unit) tuples.
+    """
+    scraped = df['scraped_at'].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return (df['source'] + "\x00" + df['name'] + "\x00" + df['date'] + "\x00" + scraped
+            + "\x00" + df['unit'].fillna("").astype(str))
+
+
+def spill(chunks, spill_dir, runs):
+    """Split chunks by month, sort and dedupe each piece, write it as a sorted run."""
+    rows = 0
+    for df in chunks:
+        df = conform(df)
+        rows += len(df)
+        for key, df_part in df.groupby(partition_key(df['date'])):
+            df_part = df_part.sort_values('_key', kind='stable').drop_duplicates('_key', keep='first')
+            run_dir = os.path.join(spill_dir, *key.split("/"))
+            os.makedirs(run_dir, exist_ok=True)
+            run_file = os.path.join(run_dir, f"run-{len(runs.get(key, [])):06d}.parquet")
+            df_part.to_parquet(run_file, index=False)
+            runs.setdefault(key, []).append(run_file)
+    return rows
+
+
+def merge_runs(run_files, parquet_file, memory_rows=MERGE_MEMORY_ROWS, schema=SCHEMA):
+    """K-way merge sorted runs into one file, row group by row group.
+
+    Earlier runs win on duplicate snapshots. Each step emits every buffered row up to the
+    smallest "last key" among runs that still have data on disk: no later batch can
+    sort before it. Pass RUN_SCHEMA to write a sorted run for another merge.
+    """
+    batch_rows = max(1_000, memory_rows // (2 * len(run_files)))
+    readers = [pq.ParquetFile(f).iter_batches(batch_size=batch_rows) for f in run_files]
+
+    def next_batch(i):
+        batch = next(readers[i], None)
+        return None if batch is None else batch.to_pandas().assign(_run=i)
+
+    buffers = [next_batch(i) for i in range(len(readers))]
+    peeked = [next_batch(i) for i in range(len(readers))]
+    tmp_file = parquet_file + ".tmp"
+    os.makedirs(os.path.dirname(parquet_file), exist_ok=True)
+    pending, pending_rows, written = [], 0, 0
+
+    with pq.ParquetWriter(tmp_file, schema, compression='snappy') as writer:
+        def flush():
+            table = pa.Table.from_pandas(pd.concat(pending, ignore_index=True), schema=schema, preserve_index=False)
+            writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+
+        last_key = None
+        while any(b is not None for b in buffers):
+            open_runs = [i for i, b in enumerate(buffers) if b is not None and peeked[i] is not None]
+            bound = min(buffers[i]['_key'].iloc[-1] for i in open_runs) if open_runs else None
+
+            ready = []
+            for i, buf in enumerate(buffers):
+                if buf is None:
+                    continue
+                take = buf['_key'] <= bound if bound is not None else buf['_key'].notna()
+                ready.append(buf[take])
+                buffers[i] = buf[~take]
+                if buffers[i].empty:
+                    buffers[i], peeked[i] = peeked[i], (next_batch(i) if peeked[i] is not None else None)
+
+            step = pd.concat(ready, ignore_index=True).sort_values(['_key', '_run'], kind='stable')
+            step = step.drop_duplicates('_key', keep='first')
+            if last_key is not None:
+                step = step[step['_key'] != last_key]
+            if step.empty:
+                continue
+            last_key = step['_key'].iloc[-1]
+            pending.append(step[schema.names])
+            pending_rows += len(step)
+            written += len(step)
+            if pending_rows >= ROW_GROUP_ROWS:
+                flush()
+                pending, pending_rows = [], 0
+        if pending:
+            flush()
+
+    os.replace(tmp_file, parquet_file)
+    return written
+
+
+def merge_partition(run_files, parquet_file, memory_rows=MERGE_MEMORY_ROWS, fan_in=MERGE_FAN_IN):
+    """Merge any number of sorted runs into a partition, at most `fan_in` at a time.
+
+    Consecutive runs are merged into longer ones until `fan_in` are left, so earlier
+    runs still win on duplicates. Intermediate runs are deleted once merged.
+    """
+    run_dir = os.path.dirname(run_files[0])
+    merge_pass = 0
+    while len(run_files) > fan_in:
+        merged = []
+        for i in range(0, len(run_files), fan_in):
+            group = run_files[i:i + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            run_file = os.path.join(run_dir, f"merge-{merge_pass:02d}-{len(merged):06d}.parquet")
+            merge_runs(group, run_file, memory_rows, RUN_SCHEMA)
+            for f in group:
+                if os.path.basename(f).startswith("merge-"):
+                    os.remove(f)
+            merged.append(run_file)
+        run_files = merged
+        merge_pass += 1
+    return merge_runs(run_files, parquet_file, memory_rows)
+
+
+def ingest(chunks, prices_dir=PRICES_DIR, spill_dir=None, memory_rows=MERGE_MEMORY_ROWS, chunk_rows=CHUNK_ROWS,
+           fan_in=MERGE_FAN_IN):
+    """Merge an iterable of DataFrames into the month partitions of `prices_dir`.
+
+    Frames of any size are fine (small ones are grouped into chunks of `chunk_rows`).
+    Returns {partition key: rows in the rewritten partition}.
+    """
+    migrate_year_partitions(prices_dir)
+    own_spill = spill_dir is None
+    spill_dir = spill_dir or tempfile.mkdtemp(prefix="daamkoto-backfill-")
+    try:
+        runs = {}
+        rows = spill(rechunk(chunks, chunk_rows), spill_dir, runs)
+        print(f"Spilled {rows} rows into {sum(len(r) for r in runs.values())} sorted runs "
+              f"across {len(runs)} partitions")
+
+        written = {}
+        for key in sorted(runs):
+            parquet_file = partition_file(prices_dir, key)
+            if os.path.exists(parquet_file):
+                # The existing partition goes first so its rows win on duplicates
+                existing = {}
+                spill((b.to_pandas() for b in pq.ParquetFile(parquet_file).iter_batches(batch_size=chunk_rows)),
+                      os.path.join(spill_dir, "existing"), existing)
+                runs[key] = existing.get(key, []) + runs[key]
+            written[key] = merge_partition(runs[key], parquet_file, memory_rows, fan_in)
+            print(f"  > {key}: {written[key]} rows from {len(runs[key])} runs")
+            shutil.rmtree(os.path.join(spill_dir, "existing"), ignore_errors=True)
+        return written
+    finally:
+        if own_spill:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def backfill(paths, data_dir=DATA_DIR, chunk_rows=CHUNK_ROWS, memory_rows=MERGE_MEMORY_ROWS):
+    """Import dumps into the store, then refresh the manifest."""
+    def chunks():
+        for path in paths:
+            print(f"Reading {path}...")
+            yield from read_chunks(path, chunk_rows)
+
+    prices_dir = os.path.join(data_dir, "prices")
+    written = ingest(chunks(), prices_dir, memory_rows=memory_rows, chunk_rows=chunk_rows)
+    manifest = write_manifest(data_dir, prices_dir)
+    return written, manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-bounded import of historical price dumps")
+    parser.add_argument("inputs", nargs="+", help="CSV/TSV, JSON Lines or Parquet files")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--memory-rows", type=int, default=MERGE_MEMORY_ROWS)
+    parser.add_argument("--publish", action="store_true", help="Publish immutable copies afterwards")
+    args = parser.parse_args()
+
+    written, _manifest = backfill(args.inputs, args.data_dir, args.chunk_rows, args.memory_rows)
+    print(f"Imported into {len(written)} partitions. Refresh derived data with "
+          f"`python scraper/anomalies.py seed`, `python scraper/variants.py rebuild` "
+          f"and `python scraper/downsample.py rebuild`.")
+    if args.publish:
+        from publish import publish
+        publish(args.data_dir)
@@ -0,0 +1,107 @@
+import os
+import re
+import gzip
+import json
+import base64
+
+from partitions import DEFAULT_SOURCE
+
+# --- SEARCH CATALOG ---
+# meta.json is a row-oriented array that repeats every key for every product, and the
+# search bar re-tokenizes every name on every keystroke. The catalog is the same data
+# stored column-wise (category/unit dictionary-encoded) plus a prebuilt token index of
+# the names, gzipped. The frontend decodes it once (adding the tokens of the few
+# distinct categories itself) and turns search into an index lookup.
+CATALOG_FILE = "catalog.json.gz"
+CATALOG_VERSION = 2
+
+# Image names are hex digests (md5 of the name, or the content hash of images.py);
+# packed as raw bytes they gzip far smaller than as text
+IMAGE_NAME = re.compile(r'^([0-9a-f]{32})\.webp$')
+
+# Must stay in sync with src/utils/catalog.js (COMMON_UNITS / normalizeWord / word split)
+COMMON_UNITS = {
+    'pcs', 'pc', 'gm', 'kg', 'ltr', 'ml', 'pack', 'bundle', 'each',
+    'set', 'bag', 'box', 'roll', 'rim', 'can', 'bottle'
+}
+WORD_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_word(word):
+    """Singular/plural folding, same rules as the search bar."""
+    if len(word) > 3 and word.endswith('s'):
+        if word.endswith('ies'):
+            return word[:-3] + 'y'
+        if word.endswith('es'):
+            return word[:-2]
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase, split on non-alphanumerics, drop units and bare numbers."""
+    words = [w for w in WORD_SPLIT.split(str(text).lower()) if w]
+    return [normalize_word(w) for w in words if w not in COMMON_UNITS and not w.isdigit()]
+
+
+def dictionary_encode(values):
+    """Return (distinct values, per-row codes)."""
+    lookup = {}
+    codes = [lookup.setdefault(v, len(lookup)) for v in values]
+    return list(lookup), codes
+
+
+def delta_encode(ids):
+    return [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+
+
+def encode_images(images):
+    """Base64 of the concatenated 16-byte digests, or the plain list if any name differs."""
+    matches = [IMAGE_NAME.match(str(image)) for image in images]
+    if not all(matches):
+        return images
+    digests = b"".join(bytes.fromhex(m.group(1)) for m in matches)
+    return {"digests": base64.b64encode(digests).decode("ascii"), "ext": ".webp"}
+
+
+def build_catalog(meta_df):
+    """Build the column-oriented catalog dict from the meta frame."""
+    # Sorted by name: stable product ids and better compression of the id lists
+    if 'source' not in meta_df.columns:
+        meta_df = meta_df.assign(source=DEFAULT_SOURCE)
+    meta_df = meta_df.sort_values(['name', 'source']).reset_index(drop=True)
+    categories, category_codes = dictionary_encode(meta_df['category'].fillna('').tolist())
+    units, unit_codes = dictionary_encode(meta_df['unit'].fillna('').tolist())
+    sources, source_codes = dictionary_encode(meta_df['source'].fillna(DEFAULT_SOURCE).tolist())
+
+    # name token -> ascending product ids (row numbers in the columns below)
+    index = {}
+    for product_id, name in enumerate(meta_df['name']):
+        for token in set(tokenize(name)):
+            index.setdefault(token, []).append(product_id)
+
+    return {
+        "version": CATALOG_VERSION,
+        "count": len(meta_df),
+        "columns": {
+            "name": meta_df['name'].tolist(),
+            "price": meta_df['price'].tolist(),
+            "image": encode_images(meta_df['image'].tolist()),
+            "category": {"values": categories, "codes": category_codes},
+            "unit": {"values": units, "codes": unit_codes},
+            "source": {"values": sources, "codes": source_codes},
+        },
+        # Id lists are delta-encoded (first id, then gaps): small numbers gzip far better
+        "tokens": {token: delta_encode(ids) for token, ids in sorted(index.items())},
+    }
+
+
+def write_catalog(meta_df, data_dir):
+    """Write data/catalog.json.gz (mtime=0 so identical content gives identical bytes)."""
+    catalog = build_catalog(meta_df)
+    payload = json.dumps(catalog, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    catalog_path = os.path.join(data_dir, CATALOG_FILE)
+    with open(catalog_path, 'wb') as f:
+        f.write(gzip.compress(payload, compresslevel=9, mtime=0))
+    print(f"Saved catalog ({catalog['count']} products, {len(catalog['tokens'])} tokens): {catalog_path}")
+    return catalog
@@ -0,0 +1,300 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from partitions import MANIFEST_FILE, partition_file, write_manifest
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+
+DOWNSAMPLED_DIR = "downsampled"
+LEVELS = ("week", "month")    # Calendar buckets, the chart's zoomed-out resolutions
+ROW_GROUP_ROWS = 50_000       # Sorted by product, so row group stats let readers skip to one product
+KEY = ['source', 'name']
+COLUMNS = KEY + ['date', 'price']
+TAIL_BUCKETS = 2              # Buckets a new close can change: its own and the one before it
+
+
+# --- DOWNSAMPLED SERIES ---
+# A ten-year daily series is ~3650 points; a zoomed-out chart cannot show more than a
+# few hundred. For every product we keep one daily close per calendar week and per
+# month, picked with LTTB (Largest-Triangle-Three-Buckets, which keeps peaks, dips and
+# the overall shape), partitioned by year next to the raw partitions:
+#   data/downsampled/<level>/year=YYYY/data.parquet    columns source, name, date, price
+#   data/downsampled/<level>/manifest.json
+# The point kept in a bucket only depends on the point kept before it and on the next
+# bucket, so a new close can only change the last two buckets of its product. Each run
+# recomputes just those from the recent closes and rewrites the year partitions they
+# fall in; `rebuild` streams the whole store one product at a time.
+
+def level_dir(level):
+    return os.path.join(DOWNSAMPLED_DIR, level)
+
+
+def level_manifest(level):
+    return os.path.join(DOWNSAMPLED_DIR, level, MANIFEST_FILE)
+
+
+def bucket_starts(dates, level):
+    """First day of the week (Monday) or month of each "YYYY-MM-DD" date."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if level == "week":
+        return days - (days.astype(np.int64) + 3) % 7   # 1970-01-01 was a Thursday
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def lttb_buckets(x, y, buckets, anchor=None):
+    """Index of the point LTTB keeps in each bucket of (x, y).
+
+    `buckets` labels every point and is sorted. The last bucket keeps its latest
+    point, so the series ends on the current close. Any other bucket keeps the point
+    spanning the largest triangle with the point kept before it and the average of
+    the next bucket; the first bucket keeps its first point unless an `anchor` (x, y),
+    the point kept just before the series, is given.
+    """
+    edges = np.append(np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]), len(buckets))
+    n_buckets = len(edges) - 1
+    keep = np.empty(n_buckets, dtype=int)
+    ax, ay = anchor if anchor is not None else (None, None)
+    for i in range(n_buckets):
+        start, end = edges[i], edges[i + 1]
+        if i == n_buckets - 1:
+            keep[i] = end - 1
+        elif ax is None:
+            keep[i] = start
+        else:
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+            area = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+            keep[i] = start + int(np.argmax(area))
+        ax, ay = x[keep[i]], y[keep[i]]
+    return keep
+
+
+def downsample(closes, level, anchor=None):
+    """One close per bucket of a single product's date-sorted `closes`."""
+    if closes.empty:
+        return closes
+    x = np.asarray(closes['date'], dtype='datetime64[D]').astype(float)
+    y = closes['price'].to_numpy(dtype=float)
+    return closes.iloc[lttb_buckets(x, y, bucket_starts(closes['date'], level), anchor)]
+
+
+def write_level(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df.sort_values(KEY + ['date']).reset_index(drop=True)
+    table = pa.Table.from_pandas(df[COLUMNS], preserve_index=False)
+    # Readers (the local API) may have the old file open
+    pq.write_table(table, path + ".tmp", row_group_size=ROW_GROUP_ROWS, compression='snappy')
+    os.replace(path + ".tmp", path)
+
+
+def load_level_manifest(data_dir, level):
+    path = os.path.join(data_dir, level_manifest(level))
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def key_index(df):
+    return pd.MultiIndex.from_frame(df[KEY])
+
+
+# --- FULL REBUILD ---
+
+class LevelWriter:
+    """Writes one level's year partitions as products stream in (sorted by source, name).
+
+    Each year buffers at most ROW_GROUP_ROWS rows before they go out as a row group;
+    the partitions replace the old ones (and stale years are dropped) on close().
+    """
+
+    def __init__(self, data_dir, level):
+        self.data_dir = data_dir
+        self.level = level
+        self.root = os.path.join(data_dir, level_dir(level))
+        self.buffers = {}
+        self.writers = {}
+
+    def add(self, points):
+        for year, part in points.groupby(points['date'].str.slice(0, 4)):
+            self.buffers.setdefault(year, []).append(part)
+            if sum(len(p) for p in self.buffers[year]) >= ROW_GROUP_ROWS:
+                self._flush(year)
+
+    def _flush(self, year):
+        table = pa.Table.from_pandas(pd.concat(self.buffers.pop(year))[COLUMNS], preserve_index=False)
+        if year not in self.writers:
+            path = partition_file(self.root, f"year={year}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.writers[year] = pq.ParquetWriter(path + ".tmp", table.schema, compression='snappy')
+        self.writers[year].write_table(table)
+
+    def close(self):
+        for year in list(self.buffers):
+            self._flush(year)
+        expected = set()
+        for year, writer in self.writers.items():
+            writer.close()
+            path = partition_file(self.root, f"year={year}")
+            os.replace(path + ".tmp", path)
+            expected.add(path)
+        for root, _dirs, files in os.walk(self.root):
+            for file in files:
+                path = os.path.join(root, file)
+                if file == "data.parquet" and path not in expected:
+                    os.remove(path)
+        return write_manifest(self.data_dir, self.root, level_manifest(self.level))
+
+
+def rebuild_downsampled(data_dir, store):
+    """Recompute every level from the whole store, one product group at a time."""
+    writers = [LevelWriter(data_dir, level) for level in LEVELS]
+    batches = store.stream("SELECT source, name, date, price FROM daily_prices ORDER BY source, name, date")
+    next(batches)  # Schema
+
+    def add(closes):
+        for _key, group in closes.groupby(KEY, sort=False):
+            for writer in writers:
+                writer.add(downsample(group, writer.level))
+
+    products = 0
+    carry = None
+    for batch in batches:
+        df = batch.to_pandas()
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+        # The last product may continue in the next batch
+        last = (df['source'] == df['source'].iloc[-1]) & (df['name'] == df['name'].iloc[-1])
+        carry = df[last]
+        add(df[~last])
+        products += df[~last].groupby(KEY).ngroups
+    if carry is not None and not carry.empty:
+        add(carry)
+        products += 1
+    for writer in writers:
+        writer.close()
+    print(f"Downsampled {products} products to {', '.join(LEVELS)} levels (rebuild)")
+
+
+# --- INCREMENTAL UPDATE ---
+
+def stored_tails(data_dir, level, changed):
+    """The last TAIL_BUCKETS + 1 stored points of every changed product.
+
+    Reads the newest year partitions first and stops as soon as every product has
+    enough points, usually after the current year.
+    """
+    manifest = load_level_manifest(data_dir, level)
+    if manifest is None:
+        return pd.DataFrame(columns=COLUMNS)
+    names = sorted({name for _source, name in changed})
+    found = []
+    for part in reversed(manifest["partitions"]):
+        path = os.path.join(data_dir, *part["path"].split("/"))
+        df = pq.read_table(path, columns=COLUMNS, filters=[('name', 'in', names)]).to_pandas()
+        found.append(df[key_index(df).isin(changed)])
+        counts = pd.concat(found).groupby(KEY).size()
+        if len(counts) == len(changed) and counts.min() > TAIL_BUCKETS:
+            break
+    if not found:
+        return pd.DataFrame(columns=COLUMNS)
+    stored = pd.concat(found, ignore_index=True).sort_values(KEY + ['date'])
+    return stored.groupby(KEY).tail(TAIL_BUCKETS + 1)
+
+
+def plan_tails(stored, level):
+    """{(source, name): (first date to recompute, anchor)}; (None, None) recomputes it all."""
+    plans = {}
+    for key, tail in stored.groupby(KEY):
+        if len(tail) <= TAIL_BUCKETS:
+            continue
+        anchor = tail.iloc[0]
+        start = str(bucket_starts([tail['date'].iloc[1]], level)[0])
+        plans[key] = (start, (float(np.datetime64(anchor['date'], 'D').astype(float)), float(anchor['price'])))
+    return plans
+
+
+def recent_closes(store, keys, since):
+    """Daily closes of `keys` from `since` (None: their whole history)."""
+    if not keys:
+        return pd.DataFrame(columns=COLUMNS)
+    closes = store.query("""
+        SELECT source, name, date, price FROM daily_prices
+        WHERE list_contains(?, name) AND date >= coalesce(?, '0000-00-00')
+        ORDER BY source, name, date
+    """, [sorted({name for _source, name in keys}), since])
+    return closes[key_index(closes).isin(keys)]
+
+
+def update_level(data_dir, level, changed, closes, stored, plans):
+    """Replace the tails of the changed products and rewrite the years they touch."""
+    root = os.path.join(data_dir, level_dir(level))
+    cuts = pd.DataFrame(
+        [(source, name, plans.get((source, name), (None, None))[0] or "") for source, name in changed],
+        columns=KEY + ['cut'],
+    )
+    points = []
+    for key, group in closes.groupby(KEY, sort=False):
+        start, anchor = plans.get(key, (None, None))
+        points.append(downsample(group[group['date'] >= start] if start else group, level, anchor))
+    points = pd.concat(points, ignore_index=True) if points else pd.DataFrame(columns=COLUMNS)
+
+    dropped = stored.merge(cuts, on=KEY)
+    dropped = dropped[dropped['date'] >= dropped['cut']]
+    years = set(points['date'].str.slice(0, 4)) | set(dropped['date'].str.slice(0, 4))
+    for year in sorted(years):
+        path = partition_file(root, f"year={year}")
+        previous = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame(columns=COLUMNS)
+        previous = previous.merge(cuts, on=KEY, how='left')
+        kept = previous[previous['cut'].isna() | (previous['date'] < previous['cut'])]
+        write_level(pd.concat([kept[COLUMNS], points[points['date'].str.slice(0, 4) == year]],
+                              ignore_index=True), path)
+    write_manifest(data_dir, root, level_manifest(level))
+    return years
+
+
+def update_downsampled(data_dir=DATA_DIR, changed=None, store=None):
+    """Refresh the downsampled levels.
+
+    `changed` is a set of (source, name) pairs with new closes; only their last buckets
+    are recomputed from the recent closes. None rebuilds every product.
+    """
+    if store is None:
+        from store import PriceStore
+        store = PriceStore(data_dir)
+    if changed is None:
+        return rebuild_downsampled(data_dir, store)
+
+    tails = {level: stored_tails(data_dir, level, changed) for level in LEVELS}
+    plans = {level: plan_tails(tails[level], level) for level in LEVELS}
+    # Products too short (or new) to have a settled bucket are recomputed from their whole
+    # history, which is then at most a couple of months
+    short = {key for key in changed if any(key not in plan for plan in plans.values())}
+    settled = set(changed) - short
+    since = min((start for plan in plans.values() for key, (start, _a) in plan.items() if key in settled),
+                default=None)
+    closes = pd.concat([recent_closes(store, settled, since), recent_closes(store, short, None)],
+                       ignore_index=True)
+
+    years = set()
+    for level in LEVELS:
+        level_plans = {key: plan for key, plan in plans[level].items() if key in settled}
+        years |= update_level(data_dir, level, changed, closes, tails[level], level_plans)
+    print(f"Downsampled {len(changed)} products to {', '.join(LEVELS)} levels "
+          f"({len(closes)} closes since {since or 'the start'}, years {', '.join(sorted(years)) or 'none'})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputed downsampled (LTTB) series")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recompute every level for every product")
+    args = parser.parse_args()
+    update_downsampled(DATA_DIR)
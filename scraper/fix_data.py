@@ -1,69 +1,110 @@
 import pandas as pd
 import os
+import sys
+
+from partitions import (
+    normalize_snapshots, dedupe_snapshots, migrate_year_partitions, write_partition, write_manifest,
+)
+from catalog import write_catalog
+from publish import publish
+
+def fix_name(row):
+    name = row['name']
+    unit = row['unit']
+    # If unit exists, is not N/A, and is not already in the name
+    if unit and unit != "N/A" and str(unit) not in name:
+        return f"{name} {unit}"
+    return name
+
 
 def fix_database():
     # We are running from the root 'main_code' directory
-    base_path = os.getcwd() 
-    
-    # Construct the exact path: public/data/prices/year=2025/data.parquet
-    parquet_path = os.path.join(base_path, "public", "data", "prices", "year=2025", "data.parquet")
-    
-    print(f"Target Database Path: {parquet_path}")
-
-    if not os.path.exists(parquet_path):
-        print(f"Error: File not found at {parquet_path}")
+    base_path = os.getcwd()
+    data_dir = os.path.join(base_path, "public", "data")
+    prices_dir = os.path.join(data_dir, "prices")
+
+    print(f"Target Database Path: {prices_dir}")
+
+    if not os.path.isdir(prices_dir):
+        print(f"Error: Folder not found at {prices_dir}")
         # Debugging: check if public/data even exists
-        public_data = os.path.join(base_path, "public", "data")
-        if os.path.exists(public_data):
-            print(f"Contents of public/data: {os.listdir(public_data)}")
+        if os.path.exists(data_dir):
+            print(f"Contents of public/data: {os.listdir(data_dir)}")
         else:
             print("Folder public/data does not exist.")
-        return
+        return False
 
-    print("File found. Loading database...")
-    
     try:
-        df = pd.read_parquet(parquet_path)
-        old_count = len(df)
-        print(f"Loaded {old_count} rows.")
-
-        # --- APPLY FIX ---
-        print("Applying name and unit fix...")
-        def fix_name(row):
-            name = row['name']
-            unit = row['unit']
-            # If unit exists, is not N/A, and is not already in the name
-            if unit and unit != "N/A" and str(unit) not in name:
-                return f"{name} {unit}"
-            return name
-
-        df['name'] = df.apply(fix_name, axis=1)
-        
-        # Deduplicate based on the new unique names
-        df = df.drop_duplicates(subset=['date', 'name', 'unit'], keep='first')
-        df = df.sort_values(by=['name', 'date'])
-        # -----------------
+        # Legacy year files are split into month partitions first
+        migrate_year_partitions(prices_dir)
+
+        partitions = sorted(
+            os.path.join(root, "data.parquet")
+            for root, _dirs, files in os.walk(prices_dir) if "data.parquet" in files
+        )
+        if not partitions:
+            print(f"Error: No partitions found in {prices_dir}")
+            return False
 
-        print(f"New row count: {len(df)} (Removed {old_count - len(df)} duplicates)")
+        # --- APPLY FIX (one month partition at a time) ---
+        print(f"Applying name and unit fix to {len(partitions)} partitions...")
+        last_rows = []
+        for parquet_path in partitions:
+            df = pd.read_parquet(parquet_path)
+            old_count = len(df)
 
-        # SAVE PARQUET
-        df.to_parquet(parquet_path, index=False, compression='snappy')
-        print("Saved fixed parquet file.")
+            df['name'] = df.apply(fix_name, axis=1)
+            # Deduplicate based on the new unique names (per snapshot, so intraday runs survive)
+            df = dedupe_snapshots(normalize_snapshots(df))
+
+            write_partition(df, parquet_path)
+            print(f"  > {os.path.relpath(parquet_path, prices_dir)}: {len(df)} rows "
+                  f"(Removed {old_count - len(df)} duplicates)")
+            last_rows.append(df.sort_values('scraped_at').drop_duplicates(['source', 'name'], keep='last'))
+        # -----------------
+
+        write_manifest(data_dir, prices_dir)
 
         # REGENERATE META.JSON
         # Path: public/data/meta.json
-        meta_path = os.path.join(base_path, "public", "data", "meta.json")
+        meta_path = os.path.join(data_dir, "meta.json")
         print(f"Regenerating meta.json at {meta_path}...")
-        
+
         # We use the LAST seen price for the search index
-        meta_df = df.sort_values('date').drop_duplicates('name', keep='last')
-        meta_df = meta_df[['name', 'category', 'unit', 'image', 'price']]
+        meta_df = pd.concat(last_rows, ignore_index=True)
+        meta_df = meta_df.sort_values('scraped_at').drop_duplicates(['source', 'name'], keep='last')
+        meta_df = meta_df[['name', 'category', 'unit', 'image', 'price', 'source']]
         meta_df.to_json(meta_path, orient='records')
+        write_catalog(meta_df, data_dir)
+
+        # REGENERATE DERIVED DATA (all keyed by the product names fixed above)
+        from store import PriceStore
+        from variants import write_variants, rebuild_unit_prices
+        from anomalies import WINDOW, seed_state
+        from downsample import update_downsampled
+
+        store = PriceStore(data_dir)
+        variants = write_variants(meta_df, data_dir)
+        rebuild_unit_prices(store.query(
+            "SELECT date, scraped_at, source, name, unit, price FROM daily_prices WHERE list_contains(?, name)",
+            [list(variants["names"])],
+        ), variants, data_dir)
+        seed_state(store.query("""
+            SELECT source, name, date, price FROM (
+                SELECT source, name, date, price,
+                       row_number() OVER (PARTITION BY source, name ORDER BY date DESC) AS recent
+                FROM daily_prices
+            ) WHERE recent <= ?
+        """, [WINDOW]), data_dir)
+        update_downsampled(data_dir, store=store)
+        publish(data_dir)
 
         print("SUCCESS: Database repair finished.")
-        
+        return True
+
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
+        return False
 
 if __name__ == "__main__":
-    fix_database()
+    sys.exit(0 if fix_database() else 1)
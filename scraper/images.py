@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+import requests
+from io import BytesIO
+from PIL import Image
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+IMAGE_DIR = os.path.join(BASE_DIR, "public", "images")
+MANIFEST_PATH = os.path.join(IMAGE_DIR, "manifest.json")
+PACK_DIR = os.path.join(IMAGE_DIR, "packs")
+
+THUMB_SIZE = (256, 256)
+PACK_CELL = 64      # Sprite cell size (px)
+PACK_COLUMNS = 16   # 16 x 16 cells = 256 thumbnails per sheet
+
+
+# --- IMAGE STORE ---
+# Images used to be named md5(display_name), so "Oil 1L" and "Oil 5L" stored the same
+# photo twice. Now the file name is a hash of the decoded thumbnail pixels: identical
+# pictures collapse to one file, whatever product or URL they came from.
+# images/manifest.json remembers which source URL produced which file (so a known URL
+# is never downloaded again) and basic info about every stored file.
+# Safe to share between scraper threads: downloads run in parallel, writes to the
+# store and its manifest are serialized.
+class ImageStore:
+    def __init__(self, image_dir=IMAGE_DIR, manifest_path=MANIFEST_PATH):
+        self.image_dir = image_dir
+        self.manifest_path = manifest_path
+        os.makedirs(image_dir, exist_ok=True)
+        self.manifest = {"sources": {}, "files": {}}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        self.downloads = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def store(self, image_url):
+        """Return the stored file name for `image_url`, downloading it only if needed."""
+        with self._lock:
+            known = self.manifest["sources"].get(image_url)
+            if known and os.path.exists(os.path.join(self.image_dir, known)):
+                self.reused += 1
+                return known
+
+        response = requests.get(image_url, timeout=10)
+        if response.status_code != 200:
+            return None
+
+        img = Image.open(BytesIO(response.content))
+        img.thumbnail(THUMB_SIZE)
+        filename = self.add_image(img)
+        with self._lock:
+            self.downloads += 1
+            self.manifest["sources"][image_url] = filename
+        return filename
+
+    def add_image(self, img):
+        """Store a thumbnail under its content name (no-op if the same pixels exist)."""
+        filename = f"{content_hash(img)}.webp"
+        filepath = os.path.join(self.image_dir, filename)
+        with self._lock:
+            if not os.path.exists(filepath):
+                img.save(filepath, "WEBP", quality=80)
+            else:
+                self.reused += 1
+            self.manifest["files"][filename] = {
+                "width": img.width,
+                "height": img.height,
+                "bytes": os.path.getsize(filepath),
+            }
+        return filename
+
+    def save(self):
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        print(f"Images: {self.downloads} downloaded, {self.reused} reused, "
+              f"{len(self.manifest['files'])} files in store")
+
+
+def content_hash(img):
+    """sha256 of the decoded pixels (first 32 hex chars, same length as the old md5 names)."""
+    img = img.convert("RGBA")
+    digest = hashlib.sha256(f"{img.width}x{img.height}".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def referenced_images(data_dir=DATA_DIR):
+    """Image names the published catalog (meta.json) still points at."""
+    meta_path = os.path.join(data_dir, "meta.json")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return {item["image"] for item in json.load(f) if item.get("image")}
+
+
+def gc(dry_run=False):
+    """Delete image files (and manifest entries) no longer referenced by the catalog.
+
+    Legacy md5-named files disappear here too once every product pointing at them has
+    been re-scraped under its content name.
+    """
+    store = ImageStore()
+    referenced = referenced_images()
+    removed = 0
+    freed = 0
+    for filename in sorted(os.listdir(IMAGE_DIR)):
+        path = os.path.join(IMAGE_DIR, filename)
+        if not filename.endswith(".webp") or filename in referenced:
+            continue
+        freed += os.path.getsize(path)
+        removed += 1
+        if not dry_run:
+            os.remove(path)
+
+    if not dry_run:
+        store.manifest["files"] = {k: v for k, v in store.manifest["files"].items() if k in referenced}
+        store.manifest["sources"] = {k: v for k, v in store.manifest["sources"].items() if v in referenced}
+        store.save()
+    action = "Would remove" if dry_run else "Removed"
+    print(f"{action} {removed} unreferenced images ({freed / 1024:.0f} KB)")
+
+
+def pack():
+    """Build optional sprite sheets of small thumbnails (images/packs/).
+
+    Each sheet holds PACK_COLUMNS x PACK_COLUMNS cells of PACK_CELL px, so a list of
+    hundreds of products costs a handful of requests. packs/index.json maps every image
+    name to [sheet, x, y].
+    """
+    names = sorted(referenced_images())
+    names = [n for n in names if os.path.exists(os.path.join(IMAGE_DIR, n))]
+    per_sheet = PACK_COLUMNS * PACK_COLUMNS
+    os.makedirs(PACK_DIR, exist_ok=True)
+    for old in os.listdir(PACK_DIR):
+        os.remove(os.path.join(PACK_DIR, old))
+
+    index = {}
+    for sheet_no, start in enumerate(range(0, len(names), per_sheet)):
+        chunk = names[start:start + per_sheet]
+        rows = (len(chunk) + PACK_COLUMNS - 1) // PACK_COLUMNS
+        sheet = Image.new("RGBA", (PACK_COLUMNS * PACK_CELL, rows * PACK_CELL), (0, 0, 0, 0))
+        for i, name in enumerate(chunk):
+            with Image.open(os.path.join(IMAGE_DIR, name)) as img:
+                img = img.convert("RGBA")
+                img.thumbnail((PACK_CELL, PACK_CELL))
+                x = (i % PACK_COLUMNS) * PACK_CELL
+                y = (i // PACK_COLUMNS) * PACK_CELL
+                # Center inside the cell
+                sheet.paste(img, (x + (PACK_CELL - img.width) // 2, y + (PACK_CELL - img.height) // 2))
+                index[name] = [sheet_no, x, y]
+        sheet_name = f"thumbs-{sheet_no}.webp"
+        sheet.save(os.path.join(PACK_DIR, sheet_name), "WEBP", quality=75)
+        print(f"  > Saved: {sheet_name} ({len(chunk)} thumbnails)")
+
+    with open(os.path.join(PACK_DIR, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"cell": PACK_CELL, "columns": PACK_COLUMNS, "images": index}, f)
+    print(f"Packed {len(index)} thumbnails into {PACK_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Image store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc_parser = sub.add_parser("gc", help="Remove images no longer referenced by meta.json")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    sub.add_parser("pack", help="Build sprite sheets of the referenced thumbnails")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(DATA_DIR, "meta.json")):
+        print("meta.json not found, refusing to touch images.")
+        sys.exit(1)
+    if args.command == "gc":
+        gc(dry_run=args.dry_run)
+    else:
+        pack()
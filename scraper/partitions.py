@@ -0,0 +1,190 @@
+import os
+import json
+import hashlib
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- STORE LAYOUT ---
+# Every scrape run is a "snapshot". Rows carry both the calendar `date` (used by the
+# frontend for daily charts) and the exact `scraped_at` timestamp of the run, so we can
+# scrape several times a day without the second run overwriting the first.
+# `source` is the retailer (see scraper/sources/); rows written before there was more
+# than one source belong to DEFAULT_SOURCE.
+SNAPSHOT_KEY = ['source', 'scraped_at', 'name', 'unit']
+DAILY_KEY = ['source', 'date', 'name', 'unit']
+SORT_KEY = ['source', 'name', 'date', 'scraped_at']
+DEFAULT_SOURCE = "chaldal"
+
+# Partition granularity: "month" -> prices/year=YYYY/month=MM/data.parquet
+#                        "year"  -> prices/year=YYYY/data.parquet (legacy layout)
+# Month files stay small, and once a month is over its file (and hash) never changes,
+# so clients can fetch only the months they show and cache the past ones forever.
+PARTITION_GRANULARITY = "month"
+MANIFEST_FILE = "manifest.json"
+
+
+def normalize_snapshots(df):
+    """Make sure every row has a `source` and a `scraped_at` timestamp.
+
+    Rows written before intraday support only had a `date`. We treat those as a single
+    snapshot taken at midnight of that day, so they still sort before any real intraday
+    snapshot of the same day.
+    """
+    df = df.copy()
+    if 'source' not in df.columns:
+        df['source'] = DEFAULT_SOURCE
+    df['source'] = df['source'].fillna(DEFAULT_SOURCE)
+    if 'scraped_at' not in df.columns:
+        df['scraped_at'] = pd.NaT
+    df['scraped_at'] = pd.to_datetime(df['scraped_at'])
+    missing = df['scraped_at'].isna()
+    if missing.any():
+        df.loc[missing, 'scraped_at'] = pd.to_datetime(df.loc[missing, 'date'])
+    df['scraped_at'] = df['scraped_at'].astype('datetime64[us]')
+    return df
+
+
+def dedupe_snapshots(df):
+    """Drop exact repeats of a snapshot but keep separate snapshots of the same day."""
+    return df.drop_duplicates(subset=SNAPSHOT_KEY, keep='first')
+
+
+def daily_close(df):
+    """Collapse intraday snapshots to the last price seen each day (the "daily close")."""
+    df = df.sort_values('scraped_at')
+    return df.drop_duplicates(subset=DAILY_KEY, keep='last').sort_values(by=['name', 'date'])
+
+
+def partition_key(dates, granularity=PARTITION_GRANULARITY):
+    """Map `date` strings ("YYYY-MM-DD") to their partition folder, e.g. "year=2025/month=03"."""
+    if granularity == "month":
+        return "year=" + dates.str.slice(0, 4) + "/month=" + dates.str.slice(5, 7)
+    return "year=" + dates.str.slice(0, 4)
+
+
+def partition_file(prices_dir, key):
+    return os.path.join(prices_dir, *key.split("/"), "data.parquet")
+
+
+def write_partition(df, parquet_file):
+    """Write one partition of snapshots, one row group per month.
+
+    Rows are grouped by month and sorted by name/date inside each group. The row group
+    min/max statistics on `date` then let DuckDB skip whole months even inside a legacy
+    year file.
+    """
+    os.makedirs(os.path.dirname(parquet_file), exist_ok=True)
+    df = df.sort_values(by=SORT_KEY).reset_index(drop=True)
+    months = df['date'].str.slice(0, 7)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(parquet_file, table.schema, compression='snappy') as writer:
+        for month in sorted(months.unique()):
+            writer.write_table(table.filter(pa.array(months == month)))
+
+
+def write_partitions(df, prices_dir, granularity=PARTITION_GRANULARITY):
+    """Write a complete dataset (no merging), e.g. for the fake data generator."""
+    df = normalize_snapshots(df)
+    for key, df_part in df.groupby(partition_key(df['date'], granularity)):
+        parquet_file = partition_file(prices_dir, key)
+        write_partition(df_part, parquet_file)
+        print(f"  > Saved: {parquet_file}")
+
+
+def migrate_year_partitions(prices_dir):
+    """Split legacy `year=YYYY/data.parquet` files into month partitions."""
+    if not os.path.isdir(prices_dir):
+        return
+    for folder in sorted(os.listdir(prices_dir)):
+        legacy_file = os.path.join(prices_dir, folder, "data.parquet")
+        if not folder.startswith("year=") or not os.path.exists(legacy_file):
+            continue
+        print(f"Migrating {folder} to month partitions...")
+        df_legacy = normalize_snapshots(pd.read_parquet(legacy_file))
+        _merge(df_legacy, prices_dir, "month")
+        os.remove(legacy_file)
+
+
+def merge_into_partitions(df_new, prices_dir, granularity=PARTITION_GRANULARITY):
+    """Merge freshly scraped rows into the partitioned store.
+
+    The target partition comes from each row's `date` (not the wall clock), so a run
+    that straddles midnight or New Year still lands in the right place. Only the
+    partitions touched by `df_new` are read and rewritten. Returns the merged frames
+    keyed by partition.
+    """
+    if granularity == "month":
+        migrate_year_partitions(prices_dir)
+    return _merge(normalize_snapshots(df_new), prices_dir, granularity)
+
+
+def _merge(df_new, prices_dir, granularity):
+    merged = {}
+    for key, df_part in df_new.groupby(partition_key(df_new['date'], granularity)):
+        parquet_file = partition_file(prices_dir, key)
+
+        if os.path.exists(parquet_file):
+            print(f"Merging with existing database ({key})...")
+            df_old = normalize_snapshots(pd.read_parquet(parquet_file))
+            df_part = pd.concat([df_old, df_part], ignore_index=True)
+        else:
+            print(f"Creating new database ({key})...")
+
+        df_part = dedupe_snapshots(df_part)
+        write_partition(df_part, parquet_file)
+        merged[key] = df_part
+    return merged
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(data_dir, prices_dir, manifest_file=MANIFEST_FILE):
+    """Describe every partition in `data/manifest.json`.
+
+    Per partition we publish the row count, byte size, date range and a sha256 of the
+    file. Clients use the date range to fetch only what they display and the hash to
+    cache a partition for as long as it does not change. Derived datasets partitioned
+    the same way (e.g. unit_prices/) pass their own `manifest_file`.
+    """
+    partitions = []
+    for root, _dirs, files in os.walk(prices_dir):
+        if "data.parquet" not in files:
+            continue
+        path = os.path.join(root, "data.parquet")
+        key = os.path.relpath(root, prices_dir).replace(os.sep, "/")
+        fields = dict(part.split("=", 1) for part in key.split("/"))
+        dates = pq.read_table(path, columns=['date'])['date']
+
+        partitions.append({
+            "key": key,
+            "path": os.path.relpath(path, data_dir).replace(os.sep, "/"),
+            "year": int(fields["year"]),
+            "month": int(fields["month"]) if "month" in fields else None,
+            "rows": len(dates),
+            "bytes": os.path.getsize(path),
+            "min_date": pc.min(dates).as_py(),
+            "max_date": pc.max(dates).as_py(),
+            "sha256": file_sha256(path),
+        })
+
+    partitions.sort(key=lambda p: p["key"])
+    manifest = {
+        "generated_at": datetime.datetime.now().replace(microsecond=0).isoformat(),
+        "partitions": partitions,
+    }
+    manifest_path = os.path.join(data_dir, manifest_file)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Saved manifest ({len(partitions)} partitions): {manifest_path}")
+    return manifest
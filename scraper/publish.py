@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import datetime
+
+from partitions import MANIFEST_FILE, file_sha256
+from catalog import CATALOG_FILE
+from anomalies import ANOMALIES_FILE
+from variants import VARIANTS_FILE, UNIT_MANIFEST_FILE
+from downsample import LEVELS, level_manifest
+
+# --- IMMUTABLE PUBLISHING ---
+# The canonical files (meta.json, prices/.../data.parquet, manifest.json) are rewritten
+# in place every day, so browsers can never cache them safely. On publish we also copy
+# each of them to a content-addressed name under data/immutable/ (hash in the filename):
+# such a file never changes, so it can be cached forever. The only mutable entry point
+# is the small data/latest.json pointer.
+# A copy costs no extra history on the database branch: git stores identical content
+# as one blob, so only the checkout holds the bytes twice.
+IMMUTABLE_DIR = "immutable"
+LATEST_FILE = "latest.json"
+HASH_LENGTH = 16
+
+# Derived artifacts to publish next to the price partitions (name -> path in data/).
+ARTIFACTS = {
+    "meta": "meta.json",
+    "catalog": CATALOG_FILE,
+    "anomalies": ANOMALIES_FILE,
+    "variants": VARIANTS_FILE,
+}
+
+# Derived partitioned datasets with a manifest of their own (name -> manifest in data/).
+DATASETS = {
+    "unit_prices": UNIT_MANIFEST_FILE,
+    **{f"lttb_{level}": level_manifest(level) for level in LEVELS},
+}
+
+
+def hashed_name(rel_path, digest):
+    """prices/year=2025/month=01/data.parquet -> prices/year=2025/month=01/data.<hash>.parquet"""
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def publish_object(data_dir, rel_path, digest=None):
+    """Copy `data/<rel_path>` to its content-addressed name and return that name."""
+    src = os.path.join(data_dir, rel_path)
+    digest = digest or file_sha256(src)
+    obj_path = f"{IMMUTABLE_DIR}/{hashed_name(rel_path, digest)}"
+    dst = os.path.join(data_dir, *obj_path.split("/"))
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copyfile(src, dst)
+    return obj_path
+
+
+def load_latest(data_dir):
+    latest_path = os.path.join(data_dir, LATEST_FILE)
+    if not os.path.exists(latest_path):
+        return None
+    with open(latest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def referenced_objects(data_dir, latest):
+    """All immutable objects reachable from a latest.json pointer."""
+    if not latest:
+        return set()
+    manifests = [latest["manifest"], *latest.get("datasets", {}).values()]
+    objects = {*manifests, *latest.get("artifacts", {}).values()}
+    for manifest_object in manifests:
+        manifest_path = os.path.join(data_dir, *manifest_object.split("/"))
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            objects.update(part["object"] for part in manifest["partitions"] if part.get("object"))
+    return objects
+
+
+def prune_objects(data_dir, keep):
+    """Delete immutable objects not referenced by the kept pointers."""
+    removed = 0
+    root_dir = os.path.join(data_dir, IMMUTABLE_DIR)
+    for root, _dirs, files in os.walk(root_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            if os.path.relpath(path, data_dir).replace(os.sep, "/") not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def publish_partitions(data_dir, manifest_file):
+    """Publish every partition listed in a manifest and record its object name there."""
+    manifest_path = os.path.join(data_dir, manifest_file)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for part in manifest["partitions"]:
+        part["object"] = publish_object(data_dir, part["path"], part["sha256"])
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def publish(data_dir):
+    """Publish content-addressed copies of the manifest, partitions and artifacts.
+
+    Writes data/latest.json:
+        {"generated_at": ..., "manifest": "immutable/manifest.<hash>.json",
+         "datasets": {"unit_prices": "immutable/unit_prices/manifest.<hash>.json"},
+         "artifacts": {"meta": "immutable/meta.<hash>.json", ...}}
+
+    Objects of the previous publish stay around (a visitor may still hold the old
+    pointer); anything older is pruned.
+    """
+    # 1. Partitions (each manifest already knows their hashes)
+    manifest = publish_partitions(data_dir, MANIFEST_FILE)
+    datasets = {}
+    for name, manifest_file in DATASETS.items():
+        if os.path.exists(os.path.join(data_dir, manifest_file)):
+            publish_partitions(data_dir, manifest_file)
+            datasets[name] = publish_object(data_dir, manifest_file.replace(os.sep, "/"))
+
+    # 2. Derived artifacts
+    artifacts = {}
+    for name, rel_path in ARTIFACTS.items():
+        if os.path.exists(os.path.join(data_dir, rel_path)):
+            artifacts[name] = publish_object(data_dir, rel_path)
+
+    # 3. Manifest itself, then the pointer
+    latest = {
+        "generated_at": datetime.datetime.now().replace(microsecond=0).isoformat(),
+        "manifest": publish_object(data_dir, MANIFEST_FILE),
+        "datasets": datasets,
+        "artifacts": artifacts,
+    }
+    previous = load_latest(data_dir)
+    with open(os.path.join(data_dir, LATEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(latest, f, indent=2)
+
+    keep = referenced_objects(data_dir, latest) | referenced_objects(data_dir, previous)
+    removed = prune_objects(data_dir, keep)
+    print(f"Published {len(manifest['partitions'])} partitions and {len(artifacts)} artifacts "
+          f"(pruned {removed} stale objects): {LATEST_FILE} -> {latest['manifest']}")
+    return latest
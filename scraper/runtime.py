@@ -0,0 +1,157 @@
+import time
+import queue
+import hashlib
+import threading
+from playwright.sync_api import sync_playwright
+
+RETRY_BACKOFF = 5.0   # Seconds before the first retry of a category page (grows per attempt)
+
+
+# --- SCRAPE RUNTIME ---
+# Runs every source plugin (scraper/sources/) in one go. Each source gets its own pool
+# of `concurrency` workers, so a slow shop does not hold up the others, and its own rate
+# limiter shared by those workers. Playwright's sync API is bound to the thread that
+# started it, so every worker drives its own browser. Failed category pages are retried
+# with a growing backoff; images go through the shared ImageStore.
+
+class RateLimiter:
+    """Spaces the page loads of one source at least `interval` seconds apart."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_image_filename(product_name):
+    # Legacy naming (before the content-addressed image store), used as a fallback
+    hash_object = hashlib.md5(product_name.encode())
+    return f"{hash_object.hexdigest()}.webp"
+
+
+def process_image(image_store, image_url, product_name, previous=None):
+    """Stored file for `image_url`; if the download fails, the product's previous image.
+
+    Keeping the image a product already had means meta.json still references that file,
+    so `images.py gc` does not delete it. Only new products fall back to the legacy name.
+    """
+    try:
+        filename = image_store.store(image_url)
+        if filename:
+            return filename
+    except Exception:
+        pass
+    return previous or get_image_filename(product_name)
+
+
+class ScrapeRuntime:
+    def __init__(self, sources, image_store, run_time, previous_images=None):
+        self.sources = sources
+        self.image_store = image_store
+        # (source, name) -> image in meta.json, the fallback when a download fails
+        self.previous_images = previous_images or {}
+        # One timestamp per run: every row of this snapshot shares it
+        self.run_time = run_time
+        self.today = run_time.strftime("%Y-%m-%d")
+        self.rows = []
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Scrape every category of every source; return the rows."""
+        workers = []
+        for source in self.sources:
+            jobs = queue.Queue()
+            for entry in source.categories():
+                jobs.put(entry)
+            self.stats[source.name] = {"categories": jobs.qsize(), "with_data": 0, "items": 0, "done": 0}
+            limiter = RateLimiter(source.min_interval)
+            for i in range(max(1, min(source.concurrency, jobs.qsize()))):
+                workers.append(threading.Thread(
+                    target=self._worker, args=(source, jobs, limiter), name=f"{source.name}-{i}", daemon=True,
+                ))
+
+        print(f"Launching {len(workers)} browsers for {len(self.sources)} source(s)...")
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.rows
+
+    def _worker(self, source, jobs, limiter):
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = browser.new_context(**source.context_options)
+            try:
+                while True:
+                    try:
+                        entry = jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    rows = self._scrape_category(source, context, entry, limiter)
+                    self._collect(source, entry, rows)
+            finally:
+                browser.close()
+
+    def _scrape_category(self, source, context, entry, limiter):
+        attempts = source.retries + 1
+        for attempt in range(1, attempts + 1):
+            limiter.wait()
+            page = context.new_page()
+            try:
+                container = source.load(page, entry['url'])
+                if not container:
+                    print(f"  > [{source.name}] Warning: No product containers found for "
+                          f"{entry['category']} (Final URL: {page.url})")
+                    return []
+                cards = source.extract(page, container)
+                return [row for row in (self._row(source, card, entry['category']) for card in cards) if row]
+            except Exception as e:
+                print(f"  > [{source.name}] Error scraping {entry['category']} (attempt {attempt}/{attempts}): {e}")
+                if attempt < attempts:
+                    time.sleep(RETRY_BACKOFF * attempt)
+            finally:
+                page.close()
+        return []
+
+    def _row(self, source, card, category):
+        try:
+            row = source.normalize(card, category)
+        except Exception:
+            return None
+        if not row:
+            return None
+        # Same picture (e.g. 1L and 5L variants) -> same stored file
+        previous = self.previous_images.get((source.name, row['name']))
+        image = previous or get_image_filename(row['name'])
+        if card.get("image_url"):
+            image = process_image(self.image_store, card["image_url"], row['name'], previous)
+        return {
+            "date": self.today,
+            "scraped_at": self.run_time,
+            "source": source.name,
+            "name": row['name'],
+            "price": row['price'],
+            "unit": row['unit'],
+            "category": row['category'],
+            "image": image,
+        }
+
+    def _collect(self, source, entry, rows):
+        with self._lock:
+            stats = self.stats[source.name]
+            stats["done"] += 1
+            self.rows.extend(rows)
+            if rows:
+                stats["with_data"] += 1
+                stats["items"] += len(rows)
+            print(f"[{source.name} {stats['done']}/{stats['categories']}] {entry['category']}: "
+                  f"Found {len(rows)} items.")
@@ -0,0 +1,218 @@
+import json
+import hashlib
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import duckdb
+import pyarrow as pa
+
+from store import PriceStore, DATA_DIR
+from variants import UNIT_MANIFEST_FILE
+from downsample import LEVELS, level_manifest
+
+# --- LOCAL READ-ONLY API ---
+# A small HTTP server over PriceStore for researchers who want the price history
+# without loading every Parquet file into a browser tab. Localhost only by default.
+#
+#   GET /health
+#   GET /series?name=...&start=YYYY-MM-DD&end=YYYY-MM-DD&source=...[&format=json|ndjson|arrow]
+#   GET /series?name=...&level=week&source=...   precomputed downsampled series (whole history)
+#   GET /range?start=...&end=...&category=...&source=...[&format=ndjson|arrow]
+#   GET /category?name=...&source=...   latest snapshot of one category (or all)
+#   GET /movers?window=7&limit=20&category=...&source=...
+#   GET /index?category=...&start=...&end=...
+#   GET /unit-prices?base=...&start=...&end=...   every pack size per kg / liter / pcs
+#
+# Every response carries an ETag derived from the partition hashes in manifest.json
+# and in the derived manifests its route reads (ROUTE_MANIFESTS), so a client
+# repeating a request after no new data was published gets a 304.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+CLIENT_TIMEOUT = 30   # Seconds a client may stall reading (or sending) before it is dropped
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class PriceAPIHandler(BaseHTTPRequestHandler):
+    store = None  # Bound by make_server()
+    server_version = "DaamKotoAPI/1.0"
+    timeout = CLIENT_TIMEOUT  # Socket timeout: a stalled stream fails and frees its cursor
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self.send_json({"error": f"Unknown endpoint {url.path}"}, status=404)
+
+        try:
+            version = self.store.refresh()
+        except FileNotFoundError as e:
+            return self.send_json({"error": str(e)}, status=503)
+
+        # Levels and unit prices have manifests of their own, written separately
+        derived = [self.store.manifest_version(m) for m in ROUTE_MANIFESTS.get(url.path, lambda p: [])(params)]
+        etag = '"' + hashlib.sha256(f"{version}|{derived}|{self.path}".encode()).hexdigest()[:32] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        try:
+            route(self, params, etag)
+        except (KeyError, ValueError) as e:
+            self.send_json({"error": f"Bad request: {e}"}, status=400)
+        except duckdb.Error as e:
+            self.send_json({"error": f"Query failed: {e}"}, status=500)
+
+    # --- Response helpers ---
+
+    def start_response(self, content_type, etag=None, status=200, length=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if length is not None:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def send_json(self, payload, etag=None, status=200):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.start_response(CONTENT_TYPES["json"], etag, status, len(body))
+        self.wfile.write(body)
+
+    def send_frame(self, df, etag, fmt):
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"format must be one of json, ndjson, arrow (got {fmt})")
+        if fmt == "json":
+            return self.send_json(json.loads(df.to_json(orient="records")), etag)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.send_batches((item for item in [table.schema, *table.to_batches()]), etag, fmt)
+
+    def send_batches(self, batches, etag, fmt):
+        """Stream Arrow batches as NDJSON lines or an Arrow IPC stream.
+
+        No Content-Length: the body is written batch by batch and ends when the
+        connection closes, so a ten-year range never sits in memory as one response.
+        """
+        if fmt not in ("ndjson", "arrow"):
+            batches.close()
+            raise ValueError(f"format must be one of ndjson, arrow (got {fmt})")
+        self.close_connection = True
+        schema = next(batches)
+        self.start_response(CONTENT_TYPES[fmt], etag)
+        try:
+            if fmt == "arrow":
+                with pa.ipc.new_stream(self.wfile, schema) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+            else:
+                for batch in batches:
+                    lines = "".join(json.dumps(row, default=str) + "\n" for row in batch.to_pylist())
+                    self.wfile.write(lines.encode("utf-8"))
+        finally:
+            batches.close()  # Hand the cursor back to the pool even if the client left
+
+    def log_message(self, format, *args):
+        print(f"[api] {self.address_string()} {format % args}")
+
+
+# --- Routes ---
+
+def route_health(handler, params, etag):
+    handler.send_json({"status": "ok", "version": handler.store.version}, etag)
+
+
+def route_series(handler, params, etag):
+    fmt = params.get("format", "json")
+    name, start, end, source = params["name"], params.get("start"), params.get("end"), params.get("source")
+    if "level" in params:
+        return handler.send_frame(handler.store.downsampled(name, params["level"], source), etag, fmt)
+    if fmt == "json":
+        handler.send_frame(handler.store.series(name, start, end, source), etag, fmt)
+    else:
+        handler.send_batches(handler.store.series_stream(name, start, end, source), etag, fmt)
+
+
+def route_range(handler, params, etag):
+    fmt = params.get("format", "ndjson")
+    batches = handler.store.range_stream(
+        params.get("start"), params.get("end"), params.get("category"), params.get("source"))
+    handler.send_batches(batches, etag, fmt)
+
+
+def route_category(handler, params, etag):
+    df = handler.store.latest(params.get("name"), params.get("source"))
+    handler.send_frame(df, etag, params.get("format", "json"))
+
+
+def route_movers(handler, params, etag):
+    df = handler.store.top_movers(
+        window=int(params.get("window", 7)),
+        limit=int(params.get("limit", 20)),
+        category=params.get("category"),
+        source=params.get("source"),
+    )
+    handler.send_frame(df, etag, params.get("format", "json"))
+
+
+def route_index(handler, params, etag):
+    df = handler.store.category_index(params.get("category"), params.get("start"), params.get("end"))
+    handler.send_frame(df, etag, params.get("format", "json"))
+
+
+def route_unit_prices(handler, params, etag):
+    df = handler.store.unit_series(params["base"], params.get("start"), params.get("end"))
+    handler.send_frame(df, etag, params.get("format", "json"))
+
+
+ROUTES = {
+    "/health": route_health,
+    "/series": route_series,
+    "/range": route_range,
+    "/category": route_category,
+    "/movers": route_movers,
+    "/index": route_index,
+    "/unit-prices": route_unit_prices,
+}
+
+
+# Derived manifests (besides manifest.json) each route reads, given its parameters
+ROUTE_MANIFESTS = {
+    "/series": lambda params: [level_manifest(params["level"])] if params.get("level") in LEVELS else [],
+    "/unit-prices": lambda params: [UNIT_MANIFEST_FILE],
+}
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, data_dir=DATA_DIR):
+    """Build (but do not start) the threaded server; port=0 picks a free port."""
+    handler = type("BoundPriceAPIHandler", (PriceAPIHandler,), {"store": PriceStore(data_dir)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, data_dir=DATA_DIR):
+    server = make_server(host, port, data_dir)
+    print(f"Serving price API from {data_dir} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local read-only price history API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.data_dir)
@@ -0,0 +1,14 @@
+from sources.base import Source
+from sources.chaldal import ChaldalSource
+
+# Every retailer the scraper knows (name -> plugin class). One run covers all of them.
+SOURCES = {source.name: source for source in [ChaldalSource]}
+
+
+def load_sources(names=None):
+    """Instantiate the selected sources (all of them by default)."""
+    names = names or list(SOURCES)
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)} (known: {', '.join(SOURCES)})")
+    return [SOURCES[name]() for name in names]
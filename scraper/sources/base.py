@@ -0,0 +1,130 @@
+import os
+import json
+import time
+
+
+# --- SOURCE PLUGINS ---
+# A source describes one retailer: where its categories come from, how to read a
+# product card off a category page and how to turn that into a store row. Everything
+# else (browsers, concurrency, rate limits, retries, images, Parquet) lives in
+# runtime.py and is shared by all sources.
+#
+# A new retailer is a subclass that sets `name`, the selectors in `spec` and a
+# categories file, and overrides a method only where its site does not fit the
+# defaults. Register it in sources/__init__.py.
+class Source:
+    name = None                 # Value of the `source` column
+    concurrency = 2             # Category pages this source scrapes in parallel
+    min_interval = 1.0          # Seconds between two page loads on this source
+    retries = 2                 # Extra attempts for a category page that failed to load
+    page_timeout = 60000        # ms
+    context_options = {}        # Playwright browser context (viewport, geolocation, ...)
+
+    categories_file = None      # JSON list of {"url", "category"}
+    fallback_categories = []
+
+    # Extraction spec: for every field, CSS selectors tried in order inside one product
+    # card. `containers` are the selectors a product card may match on a page.
+    spec = {
+        "containers": [],
+        "name": [],
+        "price": [],
+        "unit": [],
+        "image": [],
+    }
+    container_timeout = 8000    # ms to wait for each container selector
+    scroll_steps = 16           # PageDown presses for infinite scroll
+    scroll_pause = 0.8          # Seconds after each one
+    currency_symbols = ["৳"]
+
+    # --- Category discovery ---
+
+    def categories(self):
+        """Categories to scrape: the discovered file, or the fallback list."""
+        if self.categories_file and os.path.exists(self.categories_file):
+            try:
+                with open(self.categories_file, "r", encoding="utf-8") as f:
+                    categories = json.load(f)
+                print(f"[{self.name}] Loaded {len(categories)} categories from {self.categories_file}")
+                return categories
+            except Exception as e:
+                print(f"[{self.name}] Error reading categories file: {e}")
+        print(f"[{self.name}] Warning: Using default fallback categories.")
+        return list(self.fallback_categories)
+
+    def discover_categories(self):
+        """Crawl the site and rewrite `categories_file` (sources without discovery keep theirs)."""
+        print(f"[{self.name}] No category discovery, using {self.categories_file or 'the fallback categories'}")
+
+    # --- Extraction ---
+
+    def load(self, page, url):
+        """Open a category page; return the matching container selector or None."""
+        page.goto(url, timeout=self.page_timeout)
+        found = None
+        for selector in self.spec["containers"]:
+            try:
+                page.wait_for_selector(selector, timeout=self.container_timeout)
+                found = selector
+                break
+            except Exception:
+                continue
+        if not found:
+            return None
+
+        # Scroll down with breathing room for infinite scroll, then let it settle
+        for _ in range(self.scroll_steps):
+            page.keyboard.press("PageDown")
+            time.sleep(self.scroll_pause)
+        time.sleep(1.5)
+        return found
+
+    def extract(self, page, container):
+        """Raw fields of every product card on a loaded page."""
+        cards = []
+        for product in page.query_selector_all(container):
+            try:
+                card = {}
+                for field in ("name", "price", "unit"):
+                    el = self.first(product, self.spec[field])
+                    card[field] = el.inner_text().strip() if el else None
+                img_el = self.first(product, self.spec["image"])
+                card["image_url"] = img_el.get_attribute("src") if img_el else None
+                cards.append(card)
+            except Exception:
+                continue
+        return cards
+
+    @staticmethod
+    def first(element, selectors):
+        for selector in selectors:
+            found = element.query_selector(selector)
+            if found:
+                return found
+        return None
+
+    # --- Normalization ---
+
+    def normalize(self, card, category):
+        """Turn a raw card into {name, price, unit, category}, or None to skip it."""
+        if not card.get("name") or not card.get("price"):
+            return None
+        price_text = card["price"]
+        for symbol in self.currency_symbols + [","]:
+            price_text = price_text.replace(symbol, "")
+        price_text = price_text.strip()
+        if not price_text:
+            return None
+
+        name = card["name"]
+        unit = card.get("unit") or "N/A"
+        # 'name' is unique per variant (e.g. "Oil 1L" vs "Oil 5L")
+        display_name = name
+        if unit and unit != "N/A" and unit.lower() not in name.lower():
+            display_name = f"{name} {unit}"
+        return {
+            "name": display_name,
+            "price": float(price_text),
+            "unit": unit,
+            "category": category,
+        }
@@ -0,0 +1,40 @@
+import os
+
+from sources.base import Source
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ChaldalSource(Source):
+    name = "chaldal"
+    concurrency = 3
+    min_interval = 1.0
+    context_options = {
+        "viewport": {'width': 1920, 'height': 1080},
+        # Fake location (Dhaka) to skip the area popup
+        "permissions": ['geolocation'],
+        "geolocation": {'latitude': 23.8103, 'longitude': 90.4125},
+        "locale": 'en-US',
+    }
+
+    categories_file = os.path.join(SCRAPER_DIR, "categories.json")
+    fallback_categories = [
+        {"url": "https://chaldal.com/fresh-fruit", "category": "Fruits"},
+        {"url": "https://chaldal.com/fresh-vegetable", "category": "Vegetables"},
+    ]
+
+    spec = {
+        # Any product container (the layout differs between category pages)
+        "containers": ['.productV2Catalog', '.product', '.productsContent > div', '.product-pane div'],
+        "name": ['.nameTextWithEllipsis', '.pvName p', '.name'],
+        # Some use .productV2discountedPrice, some use .price
+        "price": ['.productV2discountedPrice span', '.price span', '.price'],
+        # Case sensitivity matters in CSS (.subText vs .subtext)
+        "unit": ['.subText span', '.subtext span', '.subText', '.subtext', '.sub-text'],
+        "image": ['.imageWrapperWrapper img', '.imageWrapper img', 'img'],
+    }
+
+    def discover_categories(self):
+        # Walks the sidebar and writes categories.json
+        from fetch_categories import fetch_categories
+        fetch_categories()
@@ -0,0 +1,350 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import duckdb
+
+from partitions import MANIFEST_FILE, DEFAULT_SOURCE
+from variants import UNIT_MANIFEST_FILE
+from downsample import LEVELS, load_level_manifest
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+
+CACHE_SIZE = 256
+POOL_SIZE = 4          # DuckDB cursors shared by concurrent (non-streaming) queries
+BATCH_ROWS = 10_000    # Rows per Arrow batch when streaming
+
+
+# --- PRICE STORE ---
+# One access path to the Parquet store for Python code (analysis scripts, validators,
+# the local API). It keeps a single DuckDB connection open, exposes the same
+# `daily_prices` view as the frontend, only uses parameterized queries, and caches
+# results in an LRU that is dropped whenever the partition manifest changes.
+# Queries run on a small pool of cursors over the same database, so concurrent readers
+# (e.g. the local API server) do not queue behind each other; streams get their own.
+class PriceStore:
+    def __init__(self, data_dir=DATA_DIR, cache_size=CACHE_SIZE, pool_size=POOL_SIZE):
+        self.data_dir = data_dir
+        self.prices_dir = os.path.join(data_dir, "prices")
+        self.cache_size = cache_size
+        self.con = duckdb.connect()
+        self.version = None
+        self._unit_version = None
+        self._manifest_stat = None
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self.con.cursor())
+
+    # --- Manifest tracking ---
+
+    def _partition_files(self):
+        """(files, version) from manifest.json, or a glob when there is no manifest."""
+        manifest_path = os.path.join(self.data_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            files = []
+            for root, _dirs, names in os.walk(self.prices_dir):
+                files += [os.path.join(root, n) for n in names if n.endswith(".parquet")]
+            stamp = "|".join(f"{f}:{os.path.getmtime(f)}" for f in sorted(files))
+            return sorted(files), hashlib.sha256(stamp.encode()).hexdigest()
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        files = [os.path.join(self.data_dir, *p["path"].split("/")) for p in manifest["partitions"]]
+        version = hashlib.sha256("|".join(p["sha256"] for p in manifest["partitions"]).encode()).hexdigest()
+        return files, version
+
+    def refresh(self):
+        """Re-read the manifest; rebuild the views and drop the cache if partitions changed."""
+        with self._lock:
+            manifest_path = os.path.join(self.data_dir, MANIFEST_FILE)
+            stat = os.stat(manifest_path) if os.path.exists(manifest_path) else None
+            stat_key = (stat.st_mtime_ns, stat.st_size) if stat else None
+            if self.version is not None and stat_key is not None and stat_key == self._manifest_stat:
+                return self.version
+
+            files, version = self._partition_files()
+            self._manifest_stat = stat_key
+            if version == self.version:
+                return version
+
+            if not files:
+                raise FileNotFoundError(f"No price partitions found in {self.prices_dir}")
+            # File names come from our own manifest, not from callers
+            file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+            self.con.execute(f"""
+                CREATE OR REPLACE VIEW prices AS
+                SELECT * FROM read_parquet([{file_list}], union_by_name = true)
+            """)
+            columns = [row[0] for row in self.con.execute("DESCRIBE prices").fetchall()]
+            # Stores written before intraday snapshots (one snapshot per day) or before
+            # there was more than one source
+            missing = []
+            if "scraped_at" not in columns:
+                missing.append("CAST(date AS TIMESTAMP) AS scraped_at")
+            if "source" not in columns:
+                missing.append(f"'{DEFAULT_SOURCE}' AS source")
+            if missing:
+                self.con.execute(f"""
+                    CREATE OR REPLACE VIEW prices AS
+                    SELECT *, {", ".join(missing)}
+                    FROM read_parquet([{file_list}], union_by_name = true)
+                """)
+            self.con.execute(f"""
+                CREATE OR REPLACE VIEW daily_prices AS
+                SELECT * EXCLUDE (snapshot_rank) FROM (
+                    SELECT * REPLACE (coalesce(source, '{DEFAULT_SOURCE}') AS source), row_number() OVER (
+                        PARTITION BY date, coalesce(source, '{DEFAULT_SOURCE}'), name
+                        ORDER BY scraped_at DESC NULLS LAST
+                    ) AS snapshot_rank
+                    FROM prices
+                )
+                WHERE snapshot_rank = 1
+            """)
+            self._create_unit_prices_view()
+            self._cache.clear()
+            self.version = version
+            return version
+
+    def manifest_version(self, manifest_file):
+        """Hash of the partition hashes listed in a manifest under data/ (None if missing)."""
+        manifest_path = os.path.join(self.data_dir, manifest_file)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            partitions = json.load(f)["partitions"]
+        return hashlib.sha256("|".join(p["sha256"] for p in partitions).encode()).hexdigest()
+
+    def _create_unit_prices_view(self):
+        # Written before the price manifest in a scrape, but `variants.py rebuild` rewrites
+        # it alone, so unit_series() also checks its own version
+        self._unit_version = self.manifest_version(UNIT_MANIFEST_FILE)
+        manifest_path = os.path.join(self.data_dir, UNIT_MANIFEST_FILE)
+        files = []
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                files = [os.path.join(self.data_dir, *p["path"].split("/")) for p in json.load(f)["partitions"]]
+        if not files:
+            # No linked variants yet: an empty view, so unit-price queries return no rows
+            self.con.execute("""
+                CREATE OR REPLACE VIEW unit_prices AS
+                SELECT NULL::VARCHAR AS date, NULL::VARCHAR AS base, NULL::VARCHAR AS source,
+                       NULL::VARCHAR AS name, NULL::VARCHAR AS base_unit, NULL::DOUBLE AS quantity,
+                       NULL::DOUBLE AS price, NULL::DOUBLE AS unit_price
+                WHERE false
+            """)
+            return
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW unit_prices AS
+            SELECT * FROM read_parquet([{file_list}], union_by_name = true)
+        """)
+
+    # --- Query plumbing ---
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a pooled cursor (blocks while all of them are busy)."""
+        cur = self._pool.get()
+        try:
+            yield cur
+        finally:
+            self._pool.put(cur)
+
+    def query(self, sql, params=None):
+        """Run a parameterized query (uncached) and return a DataFrame."""
+        self.refresh()
+        with self.cursor() as cur:
+            return cur.execute(sql, params or []).df()
+
+    def stream(self, sql, params=None, batch_rows=BATCH_ROWS):
+        """Yield (schema, batches) for a parameterized query without materializing it.
+
+        A stream lives as long as its consumer (e.g. a slow HTTP client), so it runs on
+        a cursor of its own instead of one of the pooled ones; the cursor is closed when
+        the batch iterator is exhausted or closed.
+        """
+        self.refresh()
+        with self._lock:
+            cur = self.con.cursor()
+        try:
+            reader = cur.execute(sql, params or []).fetch_record_batch(batch_rows)
+            yield reader.schema
+            yield from reader
+        finally:
+            cur.close()
+
+    def _cached(self, key, sql, params):
+        # The version is part of the key, so a result computed while the manifest
+        # changed underneath can never be served for the new partitions
+        key = (self.refresh(),) + key
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key].copy()
+        df = self.query(sql, params)
+        with self._lock:
+            self._cache[key] = df
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return df.copy()
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+        self.con.close()
+
+    # --- Typed queries ---
+    # Products are identified by (source, name). A series defaults to DEFAULT_SOURCE;
+    # the other queries cover every source unless `source` is given.
+
+    SERIES_SQL = """
+        SELECT date, price
+        FROM daily_prices
+        WHERE name = ? AND date >= coalesce(?, '0000-00-00') AND date <= coalesce(?, '9999-99-99')
+          AND source = coalesce(?, ?)
+        ORDER BY date
+    """
+
+    def series(self, name, start=None, end=None, source=None):
+        """Daily close series of one product: columns date, price."""
+        return self._cached(("series", name, start, end, source), self.SERIES_SQL,
+                            [name, start, end, source, DEFAULT_SOURCE])
+
+    def series_stream(self, name, start=None, end=None, source=None, batch_rows=BATCH_ROWS):
+        """Same as series(), streamed as Arrow batches (see stream())."""
+        return self.stream(self.SERIES_SQL, [name, start, end, source, DEFAULT_SOURCE], batch_rows)
+
+    RANGE_SQL = """
+        SELECT date, source, name, category, unit, price
+        FROM daily_prices
+        WHERE date >= coalesce(?, '0000-00-00') AND date <= coalesce(?, '9999-99-99')
+          AND (? IS NULL OR category = ?) AND (? IS NULL OR source = ?)
+        ORDER BY date, source, name
+    """
+
+    def range_stream(self, start=None, end=None, category=None, source=None, batch_rows=BATCH_ROWS):
+        """Every daily close in a date range (optionally one category/source), streamed."""
+        return self.stream(self.RANGE_SQL, [start, end, category, category, source, source], batch_rows)
+
+    def downsampled(self, name, level, source=None):
+        """Precomputed LTTB series of one product, one close per week or month.
+
+        `level` is one of LEVELS (see downsample.py); falls back to the full series()
+        while no levels have been built.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)} (got {level})")
+        manifest = load_level_manifest(self.data_dir, level)
+        if not manifest or not manifest["partitions"]:
+            return self.series(name, source=source)
+        files = [os.path.join(self.data_dir, *p["path"].split("/")) for p in manifest["partitions"]]
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        # Levels are updated right after the price manifest, so their hashes are part of the key
+        version = hashlib.sha256("|".join(p["sha256"] for p in manifest["partitions"]).encode()).hexdigest()
+        return self._cached(("downsampled", name, level, source, version), f"""
+            SELECT date, price
+            FROM read_parquet([{file_list}])
+            WHERE name = ? AND source = coalesce(?, ?)
+            ORDER BY date
+        """, [name, source, DEFAULT_SOURCE])
+
+    def unit_series(self, base, start=None, end=None):
+        """Daily unit price (per kg / liter / pcs) of every pack size of one base product.
+
+        `base` is a key of variants.json; columns date, name, quantity, price, unit_price.
+        """
+        self.refresh()
+        with self._lock:
+            unit_version = self.manifest_version(UNIT_MANIFEST_FILE)
+            if unit_version != self._unit_version:
+                self._create_unit_prices_view()
+        return self._cached(("unit_series", base, start, end, unit_version), """
+            SELECT date, source, name, base_unit, quantity, price, unit_price
+            FROM unit_prices
+            WHERE base = ? AND date >= coalesce(?, '0000-00-00') AND date <= coalesce(?, '9999-99-99')
+            ORDER BY date, quantity
+        """, [base, start, end])
+
+    def latest(self, category=None, source=None):
+        """Latest daily close of every product (optionally within one category/source)."""
+        return self._cached(("latest", category, source), """
+            SELECT source, name,
+                   arg_max(category, date) AS category,
+                   arg_max(unit, date) AS unit,
+                   arg_max(image, date) AS image,
+                   arg_max(price, date) AS price,
+                   max(date) AS date
+            FROM daily_prices
+            WHERE ? IS NULL OR source = ?
+            GROUP BY source, name
+            HAVING ? IS NULL OR arg_max(category, date) = ?
+            ORDER BY name, source
+        """, [source, source, category, category])
+
+    def top_movers(self, window=7, limit=20, category=None, source=None):
+        """Biggest relative price changes over the last `window` days.
+
+        Compares each product's latest close with its last close on or before
+        (latest date in the store - window days).
+        """
+        return self._cached(("top_movers", window, limit, category, source), """
+            WITH d AS (
+                SELECT source, name, category, CAST(date AS DATE) AS day, price
+                FROM daily_prices WHERE ? IS NULL OR source = ?
+            ),
+            bounds AS (
+                SELECT max(day) - CAST(? AS INTEGER) AS ref_day FROM d
+            ),
+            new AS (
+                SELECT source, name, arg_max(category, day) AS category,
+                       arg_max(price, day) AS new_price, max(day) AS new_date
+                FROM d GROUP BY source, name
+            ),
+            old AS (
+                SELECT source, name, arg_max(price, day) AS old_price, max(day) AS old_date
+                FROM d, bounds WHERE day <= ref_day GROUP BY source, name
+            )
+            SELECT n.source, n.name, n.category,
+                   CAST(o.old_date AS VARCHAR) AS old_date, o.old_price,
+                   CAST(n.new_date AS VARCHAR) AS new_date, n.new_price,
+                   n.new_price - o.old_price AS change,
+                   (n.new_price - o.old_price) / o.old_price * 100 AS change_pct
+            FROM new n JOIN old o USING (source, name), bounds
+            WHERE n.new_date > bounds.ref_day AND o.old_price > 0
+              AND (? IS NULL OR n.category = ?)
+            ORDER BY abs(change_pct) DESC, n.name
+            LIMIT ?
+        """, [source, source, window, category, category, limit])
+
+    def category_index(self, category=None, start=None, end=None):
+        """Equal-weighted price index per category and day (100 = first price in range).
+
+        Each product's price is taken relative to its first close in the range; the
+        index is the geometric mean of those relatives across the category.
+        """
+        return self._cached(("category_index", category, start, end), """
+            WITH d AS (
+                SELECT category, source, name, date, price
+                FROM daily_prices
+                WHERE date >= coalesce(?, '0000-00-00') AND date <= coalesce(?, '9999-99-99')
+                  AND (? IS NULL OR category = ?) AND price > 0
+            ),
+            base AS (
+                SELECT source, name, arg_min(price, date) AS base_price FROM d GROUP BY source, name
+            )
+            SELECT date, category,
+                   100 * exp(avg(ln(price / base_price))) AS index,
+                   count(*) AS products
+            FROM d JOIN base USING (source, name)
+            GROUP BY date, category
+            ORDER BY category, date
+        """, [start, end, category, category])
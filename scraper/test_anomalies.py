@@ -0,0 +1,36 @@
+import datetime
+
+import pandas as pd
+
+from anomalies import CONFIRM_DAYS, detect_anomalies
+
+
+def scrape(date, price):
+    """One run's rows for a single product: two intraday snapshots."""
+    return pd.DataFrame([{"date": date.isoformat(), "scraped_at": datetime.datetime.combine(date, datetime.time(hour)),
+                          "source": "chaldal", "name": "Rice", "category": "Rice", "unit": "1 kg",
+                          "image": "x.webp", "price": price} for hour in (9, 18)])
+
+
+def test_confirmed_level_shift_publishes_the_held_days(tmp_path):
+    start = datetime.date(2025, 1, 1)
+    published = []
+    for day in range(10 + CONFIRM_DAYS + 1):   # 10 days at 100, then 1000 from day 11 on
+        date = start + datetime.timedelta(days=day)
+        df_clean, _anomalies = detect_anomalies(scrape(date, 100.0 if day < 10 else 1000.0), str(tmp_path))
+        published.append(df_clean)
+
+    daily = pd.concat(published).groupby('date')['price'].agg(['count', 'max'])
+    assert len(daily) == 10 + CONFIRM_DAYS + 1
+    assert (daily['count'] == 2).all()
+    assert (daily['max'].iloc[10:] == 1000.0).all()
+
+
+def test_unconfirmed_misread_stays_held(tmp_path):
+    start = datetime.date(2025, 1, 1)
+    prices = [100.0] * 10 + [1000.0] + [100.0] * 3   # A one-day misread
+    published = []
+    for day, price in enumerate(prices):
+        df_clean, _anomalies = detect_anomalies(scrape(start + datetime.timedelta(days=day), price), str(tmp_path))
+        published.append(df_clean)
+    assert (pd.concat(published)['price'] == 100.0).all()
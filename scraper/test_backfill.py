@@ -0,0 +1,57 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from partitions import SORT_KEY, merge_into_partitions, partition_file
+from backfill import SCHEMA, ingest
+
+
+# --- EQUIVALENCE ---
+# The importer must give the same partitions as the in-memory way of doing it: existing
+# rows first, then the dump in input order, pandas drop_duplicates on the snapshot
+# identity (first one wins).
+
+SNAPSHOT = ['source', 'name', 'date', 'scraped_at', 'unit']
+
+
+def snapshots(days, names, seed, source="chaldal"):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for name in names:              # By product, like a per-product export: not date sorted
+        for date in days:
+            rows.append({"date": date.isoformat(), "scraped_at": datetime.datetime.combine(date, datetime.time(18)),
+                         "source": source, "name": name, "price": float(rng.integers(10, 500)),
+                         "unit": "1 kg", "category": "Vegetables", "image": "x.webp"})
+    return pd.DataFrame(rows)
+
+
+def expected_partition(existing, dump, month):
+    df = pd.concat([existing, dump], ignore_index=True)
+    df = df[df['date'].str.slice(0, 7) == month]
+    df = df.drop_duplicates(SNAPSHOT, keep='first')
+    return df.sort_values(SORT_KEY + ['unit']).reset_index(drop=True)[SCHEMA.names]
+
+
+@pytest.mark.parametrize("fan_in", [64, 3])   # 3 forces several merge passes
+def test_ingest_matches_pandas(tmp_path, fan_in):
+    prices_dir = str(tmp_path / "prices")
+    start = datetime.date(2025, 1, 20)
+    existing = snapshots([start + datetime.timedelta(days=d) for d in range(20)], [f"P{i}" for i in range(10)], 1)
+    merge_into_partitions(existing, prices_dir)
+
+    # Overlaps the existing days (existing rows win) and repeats itself (first one wins)
+    days = [start + datetime.timedelta(days=d) for d in range(10, 45)]
+    dump = snapshots(days, [f"P{i}" for i in range(5, 40)], 2)
+    dump = pd.concat([dump, snapshots(days, ["P7", "P30"], 3)], ignore_index=True)
+
+    chunks = (dump.iloc[i:i + 100] for i in range(0, len(dump), 100))
+    written = ingest(chunks, prices_dir, spill_dir=str(tmp_path / "spill"), memory_rows=2_000,
+                     chunk_rows=100, fan_in=fan_in)
+
+    assert sorted(written) == ["year=2025/month=01", "year=2025/month=02", "year=2025/month=03"]
+    for key in written:
+        month = key.replace("year=", "").replace("/month=", "-")
+        actual = pd.read_parquet(partition_file(prices_dir, key))[SCHEMA.names]
+        pd.testing.assert_frame_equal(actual, expected_partition(existing, dump, month), check_dtype=False)
@@ -0,0 +1,180 @@
+import os
+import json
+import datetime
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from partitions import merge_into_partitions, write_manifest
+from store import PriceStore
+from downsample import update_downsampled, write_level, level_manifest
+from server import make_server
+
+
+# --- FIXTURES ---
+# A small month-partitioned store (two products, two sources, ~3 months) with its
+# downsampled levels, served by make_server(port=0) on localhost.
+
+def build_store(data_dir):
+    prices_dir = os.path.join(data_dir, "prices")
+    start = datetime.date(2025, 1, 1)
+    rows = []
+    for day in range(90):
+        date = start + datetime.timedelta(days=day)
+        scraped_at = datetime.datetime.combine(date, datetime.time(18))
+        for source, name, price in [("chaldal", "Tomato", 80 + day % 7), ("chaldal", "Potato", 40.0),
+                                    ("shop2", "Tomato", 85.0)]:
+            rows.append({"date": date.isoformat(), "scraped_at": scraped_at, "source": source, "name": name,
+                         "price": float(price), "unit": "1 kg", "category": "Vegetables", "image": "x.webp"})
+    merge_into_partitions(pd.DataFrame(rows), prices_dir)
+    write_manifest(data_dir, prices_dir)
+    update_downsampled(data_dir)
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    data_dir = str(tmp_path_factory.mktemp("data"))
+    build_store(data_dir)
+    return data_dir
+
+
+@pytest.fixture(scope="module")
+def base_url(data_dir):
+    server = make_server(port=0, data_dir=data_dir)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    """(status, headers, body bytes); HTTP errors are returned, not raised."""
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+# --- RESPONSES ---
+
+def test_series_json(base_url):
+    status, headers, body = get(f"{base_url}/series?name=Tomato&start=2025-02-01&end=2025-02-28")
+    assert status == 200
+    assert headers["Content-Type"] == "application/json"
+    rows = json.loads(body)
+    assert len(rows) == 28
+    assert rows[0]["date"] == "2025-02-01"
+
+
+def test_series_source(base_url):
+    status, _headers, body = get(f"{base_url}/series?name=Tomato&source=shop2")
+    assert status == 200
+    assert {row["price"] for row in json.loads(body)} == {85.0}
+
+
+def test_series_level(base_url):
+    status, _headers, body = get(f"{base_url}/series?name=Tomato&level=month")
+    assert status == 200
+    rows = json.loads(body)
+    assert [row["date"][:7] for row in rows] == ["2025-01", "2025-02", "2025-03"]
+    assert rows[-1]["date"] == "2025-03-31"   # The last bucket ends on the latest close
+
+
+def test_range_ndjson(base_url):
+    status, headers, body = get(f"{base_url}/range?start=2025-03-01&end=2025-03-31&source=chaldal")
+    assert status == 200
+    assert headers["Content-Type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    assert len(rows) == 2 * 31
+    assert {row["source"] for row in rows} == {"chaldal"}
+
+
+def test_range_arrow(base_url):
+    status, headers, body = get(f"{base_url}/range?format=arrow")
+    assert status == 200
+    assert headers["Content-Type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.num_rows == 3 * 90
+    assert table.column_names == ["date", "source", "name", "category", "unit", "price"]
+
+
+def test_unit_prices_without_variants(base_url):
+    status, _headers, body = get(f"{base_url}/unit-prices?base=tomato")
+    assert status == 200
+    assert json.loads(body) == []
+
+
+def test_etag_not_modified(base_url):
+    url = f"{base_url}/movers?window=7"
+    status, headers, _body = get(url)
+    assert status == 200
+    status, _headers, body = get(url, {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert body == b""
+
+
+def test_etag_follows_the_level_manifest(tmp_path):
+    # Levels are written after the price manifest: a request in between must not pin
+    # the old level data behind a 304
+    data_dir = str(tmp_path)
+    build_store(data_dir)
+    server = make_server(port=0, data_dir=data_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/series?name=Potato&level=month"
+    try:
+        _status, headers, _body = get(url)
+        path = os.path.join(data_dir, "downsampled", "month", "year=2025", "data.parquet")
+        level = pd.read_parquet(path)
+        write_level(level.assign(price=level['price'] + 1), path)
+        write_manifest(data_dir, os.path.join(data_dir, "downsampled", "month"), level_manifest("month"))
+
+        status, _headers, body = get(url, {"If-None-Match": headers["ETag"]})
+        assert status == 200
+        assert {row["price"] for row in json.loads(body)} == {41.0}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# --- ERRORS ---
+
+@pytest.mark.parametrize("path, message", [
+    ("/series", "name"),                                   # Missing required parameter
+    ("/movers?window=soon", "invalid literal"),            # Not an integer
+    ("/series?name=Tomato&level=day", "level must be one of week, month"),
+    ("/range?format=json", "format must be one of ndjson, arrow"),
+    ("/category?format=csv", "format must be one of json, ndjson, arrow"),
+])
+def test_bad_request(base_url, path, message):
+    status, _headers, body = get(base_url + path)
+    assert status == 400
+    assert message in json.loads(body)["error"]
+
+
+def test_unknown_endpoint(base_url):
+    status, _headers, _body = get(f"{base_url}/nope")
+    assert status == 404
+
+
+# --- STREAMING ---
+
+def test_open_streams_do_not_hold_pooled_cursors(data_dir):
+    store = PriceStore(data_dir, pool_size=2)
+    streams = [store.range_stream(batch_rows=10) for _ in range(2)]
+    for stream in streams:
+        next(stream)  # Schema: the query is running and its cursor is open
+
+    done = threading.Event()
+    threading.Thread(target=lambda: (store.latest(), done.set()), daemon=True).start()
+    assert done.wait(10), "a query blocked behind open streams"
+
+    for stream in streams:
+        stream.close()
+    store.close()
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import argparse
+import pandas as pd
+
+from partitions import (
+    daily_close, normalize_snapshots, partition_key, partition_file, write_manifest,
+)
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DATA_DIR = os.path.join(BASE_DIR, "public", "data")
+
+VARIANTS_FILE = "variants.json"
+UNIT_PRICES_DIR = "unit_prices"
+UNIT_MANIFEST_FILE = os.path.join(UNIT_PRICES_DIR, "manifest.json")
+UNIT_SORT_KEY = ['base', 'date', 'quantity', 'source', 'name']
+
+
+# --- VARIANT LINKING ---
+# The scraper folds the pack size into the product name ("Soybean Oil 1 ltr" and
+# "Soybean Oil 5 ltr" are two products), so the frontend used to rescale every price on
+# the fly. This stage links the sizes of one product under a shared `base` and keeps a
+# precomputed unit-price series (per kg / liter / pcs) next to the price partitions:
+#   data/variants.json                             base -> its sizes, name -> base
+#   data/unit_prices/year=YYYY/month=MM/data.parquet   daily unit price of every size
+# Only the months touched by a scrape are recomputed. A size seen for the first time is
+# linked from then on; `python scraper/variants.py rebuild` backfills its history.
+
+# Same rules as parseUnit/toBaseValue in src/utils/quantityUtils.js
+def parse_unit(unit_str):
+    """"500 gm" -> (0.5, "mass", "kg"): quantity in base units, type, base unit."""
+    text = (unit_str or "").lower().strip()
+    if not text:
+        return 1.0, "each", "unit"
+    match = re.match(r"^([\d.]+)\s*(.*)$", text)
+    value, unit = 1.0, text
+    if match:
+        try:
+            value = float(match.group(1))
+        except ValueError:
+            pass
+        unit = match.group(2).strip()
+
+    if "kg" in unit or "gm" in unit or "gram" in unit:
+        kind, base_unit = "mass", "kg"
+    elif "liter" in unit or "litre" in unit or unit in ("l", "ltr") or "ml" in unit:
+        kind, base_unit = "volume", "liter"
+    elif "pcs" in unit or "pc" in unit or "dozen" in unit:
+        kind, base_unit = "count", "pcs"
+    else:
+        return value, "each", unit or "each"
+
+    if unit in ("gm", "gram", "ml"):
+        value /= 1000
+    elif unit == "dozen":
+        value *= 12
+    return value, kind, base_unit
+
+
+def base_name(name, unit):
+    """Strip the pack size the scraper appended: "Soybean Oil 5 ltr" -> "Soybean Oil"."""
+    unit = (unit or "").strip()
+    if unit and unit.lower() != "n/a" and name.lower().endswith(" " + unit.lower()):
+        name = name[:-len(unit) - 1]
+    return name.strip()
+
+
+def base_key(name, unit):
+    """Grouping key: base name, case and punctuation insensitive."""
+    return " ".join(re.split(r"[^a-z0-9]+", base_name(name, unit).lower())).strip()
+
+
+def link_variants(meta_df):
+    """Add base/base_name/quantity/type/base_unit columns to rows with name and unit."""
+    parsed = [parse_unit(u) for u in meta_df['unit']]
+    return meta_df.assign(
+        base=[base_key(n, u) for n, u in zip(meta_df['name'], meta_df['unit'])],
+        base_name=[base_name(n, u) for n, u in zip(meta_df['name'], meta_df['unit'])],
+        quantity=[p[0] for p in parsed],
+        type=[p[1] for p in parsed],
+        base_unit=[p[2] for p in parsed],
+    )
+
+
+def build_variants(meta_df):
+    """Linked-variant table: every base with two or more sizes of the same unit type.
+
+    {"bases": {base: {"name", "type", "base_unit", "variants": [{"name", "unit", "quantity"}]}},
+     "names": {product name: base}}
+    """
+    # Sizes are linked by name: the same name at two sources is one size of the base
+    linked = link_variants(meta_df.drop_duplicates('name', keep='last'))
+    linked = linked[linked['type'] != "each"].sort_values(['base', 'quantity', 'name'])
+
+    bases, names = {}, {}
+    for (base, kind), group in linked.groupby(['base', 'type'], sort=True):
+        if len(group) < 2:
+            continue
+        # The same base can exist in grams and in pieces; keep them apart
+        key = base if base not in bases else f"{base}|{kind}"
+        bases[key] = {
+            "name": group['base_name'].iloc[0],
+            "type": kind,
+            "base_unit": group['base_unit'].iloc[0],
+            "variants": [
+                {"name": n, "unit": u, "quantity": round(q, 6)}
+                for n, u, q in zip(group['name'], group['unit'], group['quantity'])
+            ],
+        }
+        names.update({n: key for n in group['name']})
+    return {"bases": bases, "names": names}
+
+
+def write_variants(meta_df, data_dir):
+    variants = build_variants(meta_df)
+    path = os.path.join(data_dir, VARIANTS_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(variants, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved variants ({len(variants['bases'])} linked products, {len(variants['names'])} sizes): {path}")
+    return variants
+
+
+# --- UNIT-PRICE SERIES ---
+
+def unit_prices(df_snapshots, variants):
+    """Daily unit price of every linked size in `df_snapshots`."""
+    sizes = pd.DataFrame(
+        [(v["name"], base, entry["base_unit"], float(v["quantity"]))
+         for base, entry in variants["bases"].items() for v in entry["variants"]],
+        columns=['name', 'base', 'base_unit', 'quantity'],
+    )
+    df = daily_close(normalize_snapshots(df_snapshots))[['date', 'source', 'name', 'price']]
+    df = df.merge(sizes[sizes['quantity'] > 0], on='name', how='inner')
+    df['unit_price'] = (df['price'].astype(float) / df['quantity']).round(2)
+    return df[['date', 'base', 'source', 'name', 'base_unit', 'quantity', 'price', 'unit_price']]
+
+
+def write_unit_partition(df, parquet_file):
+    os.makedirs(os.path.dirname(parquet_file), exist_ok=True)
+    df.sort_values(UNIT_SORT_KEY).to_parquet(parquet_file, index=False, compression='snappy')
+
+
+def update_unit_prices(merged, variants, data_dir):
+    """Recompute the unit-price partitions for the months a merge touched.
+
+    `merged` is the {partition key: frame} dict returned by merge_into_partitions().
+    """
+    unit_dir = os.path.join(data_dir, UNIT_PRICES_DIR)
+    for key, df_part in merged.items():
+        write_unit_partition(unit_prices(df_part, variants), partition_file(unit_dir, key))
+    return write_manifest(data_dir, unit_dir, UNIT_MANIFEST_FILE)
+
+
+def rebuild_unit_prices(df_snapshots, variants, data_dir):
+    """Write every unit-price partition from a complete history (drops stale months)."""
+    unit_dir = os.path.join(data_dir, UNIT_PRICES_DIR)
+    df = unit_prices(df_snapshots, variants)
+    expected = set()
+    for key, df_part in df.groupby(partition_key(df['date'])):
+        path = partition_file(unit_dir, key)
+        write_unit_partition(df_part, path)
+        expected.add(path)
+    for root, _dirs, files in os.walk(unit_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            if file == "data.parquet" and path not in expected:
+                os.remove(path)
+    return write_manifest(data_dir, unit_dir, UNIT_MANIFEST_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Variant linking and unit-price series")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Relink variants from meta.json and rebuild every unit-price partition")
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, "meta.json"), "r", encoding="utf-8") as f:
+        meta_df = pd.DataFrame(json.load(f))
+    variants = write_variants(meta_df, DATA_DIR)
+
+    from store import PriceStore
+    store = PriceStore(DATA_DIR)
+    history = store.query("SELECT date, scraped_at, source, name, unit, price FROM daily_prices")
+    rebuild_unit_prices(history, variants, DATA_DIR)
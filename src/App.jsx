@@ -10,7 +10,7 @@ import BuildInfo from './components/BuildInfo';
 import { useDuckDB } from './hooks/useDuckDB';
 import { TrendingUp, X, Trash2, ArrowDownWideNarrow, ArrowUp, ArrowDown, Download, FileJson, FileSpreadsheet, Image as ImageIcon, FileText, Copy, Menu, Search } from 'lucide-react';
 import { useMemo } from 'react';
-import { DATA_BASE_URL } from './config';
+import { loadCatalog } from './utils/catalog';
 import { Toaster, toast } from 'sonner';
 import CommandBar from './components/CommandBar';
 import StatsSidebar from './components/StatsSidebar';
@@ -155,13 +155,14 @@ function App() {
 
   // 1a. Fetch Product Catalog (Meta Index)
   const [allItems, setAllItems] = useState([]);
+  const [searchIndex, setSearchIndex] = useState(null);
   const [isMetaLoading, setIsMetaLoading] = useState(true);
 
   useEffect(() => {
-    fetch(`${DATA_BASE_URL}/data/meta.json`)
-      .then(res => res.json())
-      .then(data => {
-        setAllItems(data);
+    loadCatalog()
+      .then(({ items, tokenIndex }) => {
+        setAllItems(items);
+        setSearchIndex(tokenIndex);
         setIsMetaLoading(false);
       })
       .catch(err => {
@@ -387,6 +388,7 @@ function App() {
             <SearchBar
               onSelect={handleAddItem}
               items={allItems}
+              tokenIndex={searchIndex}
               loading={isMetaLoading}
               selectedItems={selectedItems}
               normTargets={normTargets.enabled ? normTargets : null}
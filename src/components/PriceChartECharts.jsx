@@ -8,6 +8,7 @@ import ExcelJS from 'exceljs';
 import { toast } from 'sonner';
 import { getNormalizedPrice, getTargetUnitLabel, parseUnit } from '../utils/quantityUtils';
 import { useLanguage } from '../context/LanguageContext.jsx';
+import { DEFAULT_SOURCE, DEFAULT_RANGE_DAYS } from '../config';
 
 // Hook to detect dark mode
 const useDarkMode = () => {
@@ -41,11 +42,13 @@ const formatDateForDisplay = (dateString) => {
 // Get today's date in YYYY-MM-DD format
 const getTodayDate = () => formatDateForInput(new Date());
 
-// Get default date range (last 90 days)
+// Get default date range (last year, or since the first scrape if that is later)
 const getDefaultDateRange = () => {
     const end = new Date();
     end.setDate(end.getDate() - 1);
-    const start = new Date('2025-11-30');
+    const yearAgo = new Date();
+    yearAgo.setDate(yearAgo.getDate() - DEFAULT_RANGE_DAYS);
+    const start = new Date(Math.max(new Date('2025-11-30'), yearAgo));
     return {
         start: formatDateForInput(start),
         end: formatDateForInput(end)
@@ -55,6 +58,13 @@ const getDefaultDateRange = () => {
 const MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
 const MONTH_NAMES_FULL = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'];
 
+// Precomputed downsampled level (one close per bucket) for each zoomed-out resolution
+const CHART_LEVELS = { weekly: 'week', monthly: 'month' };
+
+// Cache key of an item's series: daily closes or one of the levels above, per retailer
+// (the same name at two retailers is two products)
+const seriesKey = (item, level) => [level ?? 'daily', item.source ?? DEFAULT_SOURCE, item.name].join(':');
+
 // Custom styled date input component
 const DateInput = ({ value, onChange, label, min, max }) => {
     const inputRef = useRef(null);
@@ -89,7 +99,7 @@ const DateInput = ({ value, onChange, label, min, max }) => {
 };
 
 const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredItem, setHoveredItem, onStatsUpdate, normTargets, selectedDate, onDateSelect, onSelectedDateDataChange, onDateRangeChange }, ref) => {
-    const { runQuery, loading: engineLoading } = useDuckDB();
+    const { runQuery, loadRange, loadLevel, loading: engineLoading } = useDuckDB();
     const { language, t, tProduct, tUnit, formatPrice, translateDate } = useLanguage();
     const echartsRef = useRef(null);
     const dataCache = useRef(new Map());
@@ -163,7 +173,9 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
 
     // Resolution & Aggregation State
     const [resolution, setResolution] = useState('auto'); // 'auto', 'daily', 'weekly', 'monthly', 'yearly'
-    const [aggregation, setAggregation] = useState('avg'); // 'avg', 'max', 'min'
+    const [aggregation, setAggregation] = useState('avg'); // 'avg', 'max', 'min', 'trend'
+    const [dataVersion, setDataVersion] = useState(0); // Bumped when older price files get loaded
+    const [levelData, setLevelData] = useState(null); // { level, series: { [name]: points } } for 'trend'
     const [isDensityOpen, setIsDensityOpen] = useState(false);
     const [isMobileDatePickerOpen, setIsMobileDatePickerOpen] = useState(false);
 
@@ -258,6 +270,17 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
         return 'monthly';
     }, [resolution, startDate, endDate]);
 
+    // 'trend' draws weekly/monthly lines from the precomputed level: one close per
+    // bucket picked to keep peaks and dips, where avg/min/max would flatten them.
+    // It only changes the line; stats and the selected date use the daily closes.
+    const chartLevel = useMemo(() => {
+        if (aggregation !== 'trend') return null;
+        return CHART_LEVELS[getEffectiveResolution()] ?? null;
+    }, [aggregation, getEffectiveResolution]);
+
+    // Trend needs a level for the resolution (there is none for yearly)
+    const aggregationModes = CHART_LEVELS[getEffectiveResolution()] ? ['avg', 'min', 'max', 'trend'] : ['avg', 'min', 'max'];
+
     const processedData = useMemo(() => {
         const effectiveRes = getEffectiveResolution();
         if (effectiveRes === 'daily' || !filteredChartData.length) return filteredChartData;
@@ -285,6 +308,17 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
         const aggregated = [];
         const activeNames = items.map(i => i.name);
 
+        // Trend: the level's close of each bucket (when it falls inside the range)
+        const levelValues = new Map();
+        if (levelData && levelData.level === chartLevel) {
+            activeNames.forEach(name => {
+                (levelData.series[name] || []).forEach(point => {
+                    if (point.date < startDate || point.date > endDate) return;
+                    levelValues.set(`${name}|${getGroupKey(point.date)}`, point.price);
+                });
+            });
+        }
+
         groups.forEach((groupItems, key) => {
             const dateObj = new Date(groupItems[0].date);
             let dateShort = groupItems[0].dateShort;
@@ -314,7 +348,8 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                 }
 
                 let resultVal;
-                if (aggregation === 'max') resultVal = Math.max(...values);
+                if (levelValues.has(`${name}|${key}`)) resultVal = levelValues.get(`${name}|${key}`);
+                else if (aggregation === 'max') resultVal = Math.max(...values);
                 else if (aggregation === 'min') resultVal = Math.min(...values);
                 else resultVal = values.reduce((a, b) => a + b, 0) / values.length;
 
@@ -326,7 +361,7 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
         });
 
         return aggregated;
-    }, [filteredChartData, getEffectiveResolution, aggregation, items]);
+    }, [filteredChartData, getEffectiveResolution, aggregation, items, levelData, chartLevel, startDate, endDate]);
 
     // Expose methods to parent
     React.useImperativeHandle(ref, () => ({
@@ -674,14 +709,16 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
         }
     }));
 
-    const fetchItemData = useCallback(async (item) => {
-        if (dataCache.current.has(item.name)) {
-            return dataCache.current.get(item.name);
+    const fetchItemData = useCallback(async (item, level) => {
+        const key = seriesKey(item, level);
+        if (dataCache.current.has(key)) {
+            return dataCache.current.get(key);
         }
         const result = await runQuery(`
       SELECT date, price 
-      FROM 'prices/*.parquet' 
+      FROM ${level ? `lttb_${level}` : 'daily_prices'} 
       WHERE name = '${item.name.replace(/'/g, "''")}' 
+        AND source = '${(item.source ?? DEFAULT_SOURCE).replace(/'/g, "''")}' 
       ORDER BY date ASC
     `);
         const formattedData = result.map(r => ({
@@ -690,14 +727,15 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
             dateShort: new Date(r.date).toLocaleDateString('en-GB', { day: 'numeric', month: 'short' }),
             fullDate: new Date(r.date).toLocaleDateString('en-GB', { day: 'numeric', month: 'long', year: 'numeric' })
         }));
-        dataCache.current.set(item.name, formattedData);
+        dataCache.current.set(key, formattedData);
         return formattedData;
     }, [runQuery]);
 
-    const buildChartData = useCallback((itemNames) => {
+    const buildChartData = useCallback((chartItems) => {
         const dateMap = new Map();
-        itemNames.forEach(name => {
-            const itemData = dataCache.current.get(name);
+        chartItems.forEach(item => {
+            const name = item.name;
+            const itemData = dataCache.current.get(seriesKey(item));
             if (!itemData) return;
             itemData.forEach(point => {
                 if (!dateMap.has(point.date)) {
@@ -714,15 +752,29 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
         return Array.from(dateMap.values()).sort((a, b) => new Date(a.date) - new Date(b.date));
     }, []);
 
+    // Only the default range is loaded at start; widening it fetches the older months,
+    // after which the cached daily series are read again
+    useEffect(() => {
+        if (engineLoading || !startDate || !endDate) return;
+        loadRange(startDate, endDate)
+            .then(loaded => {
+                if (!loaded) return;
+                for (const key of [...dataCache.current.keys()]) {
+                    if (key.startsWith('daily:')) dataCache.current.delete(key);
+                }
+                setDataVersion(v => v + 1);
+            })
+            .catch(err => console.warn('Failed to load older price data', err));
+    }, [startDate, endDate, engineLoading, loadRange]);
+
     useEffect(() => {
         if (engineLoading) return;
 
         // Identify added/removed items
         // Simple logic: if items changed, re-fetch missing ones and rebuild
-        const currentNames = new Set(items.map(i => i.name));
 
         // Check if we need to fetch anything
-        const missing = items.filter(item => !dataCache.current.has(item.name));
+        const missing = items.filter(item => !dataCache.current.has(seriesKey(item)));
 
         if (missing.length > 0) {
             const fetchAll = async () => {
@@ -733,15 +785,36 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                 }
                 setLoadingItem(null);
                 setLoading(false);
-                setChartData(buildChartData([...currentNames]));
+                setChartData(buildChartData(items));
             };
             fetchAll();
         } else {
             // Just rebuild if selection changed but data is cached
-            setChartData(buildChartData([...currentNames]));
+            setChartData(buildChartData(items));
         }
 
-    }, [items, engineLoading, fetchItemData, buildChartData]);
+    }, [items, engineLoading, dataVersion, fetchItemData, buildChartData]);
+
+    // Trend lines: load the level on first use. Older data branches have none, and
+    // the line then falls back to the average of the daily closes.
+    useEffect(() => {
+        if (engineLoading || !chartLevel) {
+            setLevelData(null);
+            return;
+        }
+        let cancelled = false;
+        const fetchLevel = async () => {
+            if (!await loadLevel(chartLevel)) return;
+            const series = {};
+            for (const item of items) {
+                series[item.name] = await fetchItemData(item, chartLevel);
+            }
+            // A newer selection or zoom level may have started meanwhile
+            if (!cancelled) setLevelData({ level: chartLevel, series });
+        };
+        fetchLevel();
+        return () => { cancelled = true; };
+    }, [items, engineLoading, chartLevel, loadLevel, fetchItemData]);
 
 
 
@@ -1175,8 +1248,8 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                     {/* Aggregation (MOVED RIGHT OF DENSITY) */}
                     {getEffectiveResolution() !== 'daily' && (
                         <div className="flex bg-background rounded-lg p-1">
-                            {['avg', 'min', 'max'].map(mode => (
-                                <Tooltip key={mode} content={mode === 'avg' ? 'Average Price' : mode === 'min' ? 'Lowest Price' : 'Highest Price'}>
+                            {aggregationModes.map(mode => (
+                                <Tooltip key={mode} content={mode === 'avg' ? 'Average Price' : mode === 'min' ? 'Lowest Price' : mode === 'max' ? 'Highest Price' : 'Trend (keeps peaks and dips)'}>
                                     <button
                                         onClick={() => setAggregation(mode)}
                                         className={`px-3 py-1 text-xs font-medium rounded-md active:scale-[0.96] transition-transform duration-200 ${aggregation === mode
@@ -1184,7 +1257,7 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                                             : 'text-muted-foreground hover:text-foreground hover:bg-accent'
                                             }`}
                                     >
-                                        {mode === 'avg' ? 'Avg' : mode === 'min' ? 'Low' : 'High'}
+                                        {mode === 'avg' ? 'Avg' : mode === 'min' ? 'Low' : mode === 'max' ? 'High' : 'Trend'}
                                     </button>
                                 </Tooltip>
                             ))}
@@ -1252,7 +1325,7 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                 {/* Aggregation (Inline on mobile if resolution is not daily) */}
                 {getEffectiveResolution() !== 'daily' && (
                     <div className="flex bg-background border border-border rounded-xl p-0.5">
-                        {['avg', 'min', 'max'].map(mode => (
+                        {aggregationModes.map(mode => (
                             <button
                                 key={mode}
                                 onClick={() => setAggregation(mode)}
@@ -1261,7 +1334,7 @@ const PriceChartECharts = React.forwardRef(({ items = [], colors = [], hoveredIt
                                     : 'text-muted-foreground hover:text-foreground'
                                     }`}
                             >
-                                {mode === 'avg' ? 'Avg' : mode === 'min' ? 'Low' : 'High'}
+                                {mode === 'avg' ? 'Avg' : mode === 'min' ? 'Low' : mode === 'max' ? 'High' : 'Trend'}
                             </button>
                         ))}
                     </div>
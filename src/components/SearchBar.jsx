@@ -6,6 +6,7 @@ import ItemHoverCard from './ItemHoverCard';
 import { useLanguage } from '../context/LanguageContext.jsx';
 import ItemDetailModal from './ItemDetailModal';
 import ProductImage from './ProductImage';
+import { lookupPrefix, normalizeWord, isIndexedWord } from '../utils/catalog';
 
 const CATEGORY_ALIASES = {
     food: [
@@ -90,10 +91,35 @@ function getDamerauLevenshteinDistance(a, b) {
     return d[al][bl];
 }
 
+// Products matching every (non-unit) query word by token prefix, or null when the
+// index cannot answer (no index, only unit/number words, or no hit - e.g. a typo).
+// Category aliases ("food", "baby", ...) are not in the token index; `aliasIds` maps
+// each alias to the products of its categories and is merged into every word's hits.
+function lookupCandidates(tokenIndex, aliasIds, queryWords) {
+    if (!tokenIndex) return null;
+    const words = queryWords.filter(isIndexedWord);
+    if (words.length === 0) return null;
+
+    let candidates = null;
+    for (const word of words) {
+        const wordNorm = normalizeWord(word);
+        const ids = lookupPrefix(tokenIndex, wordNorm);
+        lookupPrefix(tokenIndex, word).forEach(id => ids.add(id));
+        Object.entries(aliasIds).forEach(([alias, aliasMatches]) => {
+            if (alias.startsWith(word) || alias.startsWith(wordNorm)) {
+                aliasMatches.forEach(id => ids.add(id));
+            }
+        });
+        candidates = candidates ? new Set([...candidates].filter(id => ids.has(id))) : ids;
+        if (candidates.size === 0) return null;
+    }
+    return [...candidates];
+}
 
 export default function SearchBar({ 
     onSelect, 
     items = [], 
+    tokenIndex = null,
     loading = false, 
     selectedItems = [], 
     normTargets, 
@@ -160,7 +186,32 @@ export default function SearchBar({
         });
     }, [items]);
 
-    // 3. Handle Search Logic using uFuzzy
+    // Product ids per category alias, merged into token index lookups
+    const aliasIds = useMemo(() => {
+        const categoryLower = items.map(item => (item.category || '').toLowerCase());
+        return Object.fromEntries(Object.entries(CATEGORY_ALIASES).map(([aliasName, categories]) => {
+            const ids = new Set();
+            categoryLower.forEach((category, id) => {
+                if (categories.includes(category)) ids.add(id);
+            });
+            return [aliasName, ids];
+        }));
+    }, [items]);
+
+    // Tokenize every name once per catalog instead of on every keystroke
+    const itemWords = useMemo(() => {
+        return items.map(item => {
+            const nameWords = item.name.toLowerCase().split(/[^a-z0-9]+/i).filter(Boolean);
+            return {
+                nameWords,
+                nameWordsNorm: nameWords.map(normalizeWord),
+                // Exclude quantity numbers and common packaging/unit names for true semantic name coverage
+                semanticWords: nameWords.filter(isIndexedWord)
+            };
+        });
+    }, [items]);
+
+    // 3. Handle Search Logic (token index lookup, uFuzzy scan as fallback)
     const results = useMemo(() => {
         if (!query.trim()) {
             return [];
@@ -176,47 +227,24 @@ export default function SearchBar({
             return [];
         }
 
-        // Perform the search with outOfOrder = 5 using uFuzzy's default optimized thresholds
-        const [idx, info, order] = uf.search(haystack, cleanQuery, 5);
+        const queryWords = cleanQuery.toLowerCase().split(/\s+/).filter(Boolean);
 
-        // Fallback to raw match indices (idx) if uFuzzy's infoThresh/sortThresh (default 100) is exceeded and returns order = null
-        const matchedIndices = order ? order.map(infoIdx => info.idx[infoIdx]) : idx;
+        // Prefer the prebuilt token index; fall back to a fuzzy scan (typos, substrings)
+        let matchedIndices = lookupCandidates(tokenIndex, aliasIds, queryWords);
+        if (!matchedIndices) {
+            // Perform the search with outOfOrder = 5 using uFuzzy's default optimized thresholds
+            const [idx, info, order] = uf.search(haystack, cleanQuery, 5);
 
-        if (matchedIndices && matchedIndices.length > 0) {
-            // Retrieve all matched items
-            const matchedItems = matchedIndices.map(infoIdx => items[infoIdx]);
-            
-            const queryWords = cleanQuery.toLowerCase().split(/\s+/).filter(Boolean);
-            
-            // Singular/plural normalization helper
-            const normalizeWord = (w) => {
-                if (w.length > 3 && w.endsWith('s')) {
-                    if (w.endsWith('ies')) {
-                        return w.slice(0, -3) + 'y';
-                    }
-                    if (w.endsWith('es')) {
-                        return w.slice(0, -2);
-                    }
-                    return w.slice(0, -1);
-                }
-                return w;
-            };
+            // Fallback to raw match indices (idx) if uFuzzy's infoThresh/sortThresh (default 100) is exceeded and returns order = null
+            matchedIndices = order ? order.map(infoIdx => info.idx[infoIdx]) : idx;
+        }
 
+        if (matchedIndices && matchedIndices.length > 0) {
             const queryWordsNorm = queryWords.map(normalizeWord);
-            
-            // Common unit identifiers to ignore for semantic coverage length calculation
-            const COMMON_UNITS = new Set([
-                'pcs', 'pc', 'gm', 'kg', 'ltr', 'ml', 'pack', 'bundle', 'each', 
-                'set', 'bag', 'box', 'roll', 'rim', 'can', 'bottle'
-            ]);
-
-            const scoredItems = matchedItems.map(item => {
-                const nameLower = item.name.toLowerCase();
-                const nameWords = nameLower.split(/[^a-z0-9]+/i).filter(Boolean);
-                const nameWordsNorm = nameWords.map(normalizeWord);
-                
-                // Exclude quantity numbers and common packaging/unit names for true semantic name coverage
-                const semanticWords = nameWords.filter(w => !COMMON_UNITS.has(w) && !/^\d+$/.test(w));
+
+            const scoredItems = matchedIndices.map(itemIdx => {
+                const item = items[itemIdx];
+                const { nameWords, nameWordsNorm, semanticWords } = itemWords[itemIdx];
                 
                 let matchedLength = 0;
                 let exactMatches = 0;
@@ -308,7 +336,7 @@ export default function SearchBar({
                 .slice(0, 24);
         }
         return [];
-    }, [query, uf, haystack, items]);
+    }, [query, uf, haystack, items, itemWords, tokenIndex, aliasIds]);
 
     // Lift suggestion dropdown state up to notify if suggestions list is open (including "no results" state)
     const showSuggestions = isOpen && (results.length > 0 || (query.trim() !== '' && results.length === 0));
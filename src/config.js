@@ -9,3 +9,12 @@ export const DATA_BASE_URL = isRemote
 export const DATA_START_YEAR = isRemote
   ? 2025
   : new Date().getFullYear() - 10;
+
+
+// Retailer of rows stored before there was more than one source (scraper/partitions.py)
+export const DEFAULT_SOURCE = 'chaldal';
+
+// The chart opens on the last year (or since the first scrape, if later). Only the
+// price partitions of that range are downloaded before the app is ready; older ones
+// are fetched when the range is widened.
+export const DEFAULT_RANGE_DAYS = 365;
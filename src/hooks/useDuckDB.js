@@ -1,12 +1,130 @@
 import { useState, useEffect, useCallback } from 'react';
 import * as duckdb from '@duckdb/duckdb-wasm';
 
-import { DATA_BASE_URL, DATA_START_YEAR } from '../config';
+import { DATA_BASE_URL, DATA_START_YEAR, DEFAULT_SOURCE, DEFAULT_RANGE_DAYS } from '../config';
+import { loadManifest, loadDataset } from '../utils/dataSource';
 
 // GLOBAL VARIABLES (Singleton Pattern)
 // These live outside the component lifecycle so they persist
 let dbInstance = null;
 let initPromise = null;
+const levelPromises = new Map();
+let priceFiles = [];                // Every price file we could load, with its date range
+const registeredFiles = new Set();  // The ones fetched (or tried) so far
+let registerQueue = Promise.resolve();
+
+// Resolve which Parquet files exist for the years we show.
+// Prefer the partition manifest: it lists every partition (month) with its date
+// range and content hash, so we fetch only the partitions of the range on screen,
+// from immutable, cacheable URLs (see utils/dataSource.js).
+// Older data branches have no manifest, so fall back to one file per year.
+const listPriceFiles = async (startYear, currentYear) => {
+  const startDate = `${startYear}-01-01`;
+  try {
+    const manifest = await loadManifest();
+    if (manifest) {
+      return manifest.partitions
+        .filter(part => part.max_date >= startDate)
+        .map(part => ({
+          url: part.url,
+          file: `prices/${part.key.replace(/[=/]/g, '_')}.parquet`,
+          cache: part.cache,
+          minDate: part.min_date,
+          maxDate: part.max_date
+        }));
+    }
+  } catch (err) {
+    console.warn("No partition manifest, falling back to yearly files", err);
+  }
+
+  const years = [];
+  for (let y = startYear; y <= currentYear; y++) {
+    years.push({
+      url: `${DATA_BASE_URL}/data/prices/year=${y}/data.parquet`,
+      file: `prices/year_${y}.parquet`,
+      cache: 'default',
+      minDate: `${y}-01-01`,
+      maxDate: `${y}-12-31`
+    });
+  }
+  return years;
+};
+
+// Fetch and register the price files overlapping [start, end] that are not loaded
+// yet. Resolves to true when anything new was registered.
+const registerPriceFiles = async (db, start, end) => {
+  const fresh = priceFiles.filter(({ file, minDate, maxDate }) =>
+    !registeredFiles.has(file) && maxDate >= start && minDate <= end);
+  fresh.forEach(({ file }) => registeredFiles.add(file));
+
+  const loaded = await Promise.all(fresh.map(async ({ url, file, cache }) => {
+    try {
+      const response = await fetch(url, { cache });
+      if (!response.ok) return false;
+      const buffer = await response.arrayBuffer();
+      // We register each file as a flat "prices/<partition>.parquet" name so the
+      // queries can keep globbing 'prices/*.parquet'.
+      await db.registerFileBuffer(file, new Uint8Array(buffer));
+      return true;
+    } catch (err) {
+      console.warn(`Failed to load price data from ${url}`, err);
+      return false;
+    }
+  }));
+  return loaded.some(Boolean);
+};
+
+// Register a downsampled chart level ("week" or "month": one close per product per
+// bucket, see scraper/downsample.py) and expose it as the view lttb_<level>.
+// Loaded on first use only, since the default one-year view never needs it.
+// Resolves to false when the data branch has no such level.
+const registerLevel = async (db, level) => {
+  const manifest = await loadDataset(`lttb_${level}`, `downsampled/${level}/manifest.json`);
+  if (!manifest?.partitions.length) return false;
+
+  await Promise.all(manifest.partitions.map(async ({ url, key, cache }) => {
+    const response = await fetch(url, { cache });
+    if (!response.ok) throw new Error(`Failed to load ${url}`);
+    const buffer = await response.arrayBuffer();
+    await db.registerFileBuffer(`downsampled/${level}/${key.replace(/[=/]/g, '_')}.parquet`, new Uint8Array(buffer));
+  }));
+
+  const conn = await db.connect();
+  try {
+    await conn.query(`
+      CREATE OR REPLACE VIEW lttb_${level} AS
+      SELECT * FROM read_parquet('downsampled/${level}/*.parquet')
+    `);
+  } finally {
+    await conn.close();
+  }
+  return true;
+};
+
+// Expose the "daily close" view over the registered price files.
+// The store keeps every intraday snapshot (scraped_at); charts want one point per
+// day and product, so we pick the last snapshot of each date per (source, name).
+// Older files have no scraped_at column (union_by_name fills it with NULL) and no
+// source column, in which case every row belongs to the default source.
+const createDailyPricesView = async (conn) => {
+  const described = await conn.query(`
+    DESCRIBE SELECT * FROM read_parquet('prices/*.parquet', union_by_name = true)
+  `);
+  const columns = described.toArray().map(r => r.toJSON().column_name);
+  const source = columns.includes('source')
+    ? `* REPLACE (coalesce(source, '${DEFAULT_SOURCE}') AS source)`
+    : `*, '${DEFAULT_SOURCE}' AS source`;
+  await conn.query(`
+    CREATE OR REPLACE VIEW daily_prices AS
+    SELECT * EXCLUDE (snapshot_rank) FROM (
+      SELECT *, row_number() OVER (
+        PARTITION BY date, source, name ORDER BY scraped_at DESC NULLS LAST
+      ) AS snapshot_rank
+      FROM (SELECT ${source} FROM read_parquet('prices/*.parquet', union_by_name = true))
+    )
+    WHERE snapshot_rank = 1
+  `);
+};
 
 export const useDuckDB = () => {
   const [db, setDb] = useState(dbInstance);
@@ -51,43 +169,27 @@ export const useDuckDB = () => {
           
           await newDb.instantiate(bundle.mainModule, bundle.pthreadWorker);
 
-          // Register the Parquet file (Virtual File System)
-          // We load the last 10 years of data (+1 for range coverage)
+          // Register the Parquet files (Virtual File System)
+          // Files exist from DATA_START_YEAR on; only the default range is fetched now,
+          // loadRange() adds older ones when the chart asks for them
           const currentYear = new Date().getFullYear();
           const startYear = DATA_START_YEAR; 
-          
-          console.log(`🦆 Fetching Parquet files from ${startYear} to ${currentYear}...`);
-          
-          const years = [];
-          for (let y = startYear; y <= currentYear; y++) {
-            years.push(y);
-          }
+          const today = new Date();
+          const rangeStart = new Date(today);
+          rangeStart.setDate(rangeStart.getDate() - DEFAULT_RANGE_DAYS);
+          const toDate = (date) => date.toISOString().split('T')[0];
+
+          priceFiles = await listPriceFiles(startYear, currentYear);
+          console.log(`🦆 Fetching Parquet files from ${toDate(rangeStart)} on (${priceFiles.length} available since ${startYear})...`);
+          await registerPriceFiles(newDb, toDate(rangeStart), toDate(today));
 
-          // Parallel fetch for all years
-          await Promise.all(years.map(async (year) => {
-            const parquetUrl = `${DATA_BASE_URL}/data/prices/year=${year}/data.parquet`;
-            try {
-              const response = await fetch(parquetUrl);
-              if (response.ok) {
-                const buffer = await response.arrayBuffer();
-                // We register each file into a virtual path pattern DuckDB can glob
-                // e.g., "years/2023.parquet" or just keep the structure "data/prices/year=2023/data.parquet"
-                // To make the glob easy, let's mirror the structure.
-                // DuckDB WASM supports recursive directory creation? maybe not easily with registerFileBuffer
-                // It's easier to register them as flat files with unique names and use a list in the query
-                // OR register nicely.
-                // Let's simplfy: register as "prices/year_{year}.parquet"
-                await newDb.registerFileBuffer(`prices/year_${year}.parquet`, new Uint8Array(buffer));
-              } else {
-                 // console.warn(`Skipping missing year: ${year}`);
-              }
-            } catch (err) {
-              console.warn(`Failed to load data for year ${year}`, err);
-            }
-          }));
-
-          // Warm up connection
+          // Warm up connection and expose the "daily close" view
           const conn = await newDb.connect();
+          try {
+            await createDailyPricesView(conn);
+          } catch (err) {
+            console.warn("Failed to create daily_prices view (no price files loaded?)", err);
+          }
           await conn.close();
 
           console.log("🦆 DuckDB Ready!");
@@ -130,5 +232,35 @@ export const useDuckDB = () => {
     }
   }, [db]);
 
-  return { db, loading, error, runQuery };
+  // Make sure the price files of [start, end] are registered. Resolves to true when
+  // older files were added (daily_prices is then rebuilt over them).
+  const loadRange = useCallback(async (start, end) => {
+    if (!db) return false;
+    const task = registerQueue.then(async () => {
+      if (!await registerPriceFiles(db, start, end)) return false;
+      const conn = await db.connect();
+      try {
+        await createDailyPricesView(conn);
+      } finally {
+        await conn.close();
+      }
+      return true;
+    });
+    registerQueue = task.catch(() => false);
+    return task;
+  }, [db]);
+
+  // Make the lttb_<level> view available; false means callers use daily_prices
+  const loadLevel = useCallback(async (level) => {
+    if (!db) return false;
+    if (!levelPromises.has(level)) {
+      levelPromises.set(level, registerLevel(db, level).catch(err => {
+        console.warn(`Failed to load the ${level} chart level`, err);
+        return false;
+      }));
+    }
+    return levelPromises.get(level);
+  }, [db]);
+
+  return { db, loading, error, runQuery, loadRange, loadLevel };
 };
\ No newline at end of file
@@ -0,0 +1,138 @@
+import { fetchArtifact } from './dataSource';
+
+/**
+ * Loads the product catalog.
+ *
+ * Prefers the compact `catalog.json.gz` published by the pipeline: columns
+ * (category/unit dictionary-encoded) plus a prebuilt token index of the names;
+ * the tokens of the few distinct categories are added here. Falls back
+ * to the row-oriented `meta.json` on data branches that predate it.
+ * Returns { items, tokenIndex } where tokenIndex is null for meta.json.
+ */
+export const loadCatalog = async () => {
+    try {
+        const response = await fetchArtifact('catalog', 'catalog.json.gz');
+        if (response.ok) {
+            return decodeCatalog(await readMaybeGzipJson(response));
+        }
+    } catch (err) {
+        console.warn("Catalog unavailable, falling back to meta.json", err);
+    }
+
+    const response = await fetchArtifact('meta', 'meta.json');
+    return { items: await response.json(), tokenIndex: null };
+};
+
+// Static hosts serve .gz either as raw bytes or with Content-Encoding: gzip
+// (already decompressed by the browser). Check the gzip magic bytes to tell.
+const readMaybeGzipJson = async (response) => {
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+        return JSON.parse(new TextDecoder().decode(bytes));
+    }
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+    return JSON.parse(await new Response(stream).text());
+};
+
+// Singular/plural normalization (mirrored by scraper/catalog.py for the token index)
+export const normalizeWord = (w) => {
+    if (w.length > 3 && w.endsWith('s')) {
+        if (w.endsWith('ies')) {
+            return w.slice(0, -3) + 'y';
+        }
+        if (w.endsWith('es')) {
+            return w.slice(0, -2);
+        }
+        return w.slice(0, -1);
+    }
+    return w;
+};
+
+// Common unit identifiers to ignore for semantic coverage length calculation
+// (also stripped from the token index by scraper/catalog.py)
+export const COMMON_UNITS = new Set([
+    'pcs', 'pc', 'gm', 'kg', 'ltr', 'ml', 'pack', 'bundle', 'each', 
+    'set', 'bag', 'box', 'roll', 'rim', 'can', 'bottle'
+]);
+
+export const isIndexedWord = (w) => !COMMON_UNITS.has(w) && !/^\d+$/.test(w);
+
+const tokenize = (text) => (text || '').toLowerCase().split(/[^a-z0-9]+/)
+    .filter(w => w && isIndexedWord(w))
+    .map(normalizeWord);
+
+// Version 2 packs hex image names as base64 of their raw digests
+const decodeImages = (image, count) => {
+    if (Array.isArray(image)) return image;
+    const bytes = atob(image.digests);
+    const names = new Array(count);
+    for (let id = 0; id < count; id++) {
+        let hex = '';
+        for (let i = id * 16; i < id * 16 + 16; i++) {
+            hex += bytes.charCodeAt(i).toString(16).padStart(2, '0');
+        }
+        names[id] = hex + image.ext;
+    }
+    return names;
+};
+
+const decodeCatalog = (catalog) => {
+    const { name, price, image, category, unit, source } = catalog.columns;
+    const images = decodeImages(image, name.length);
+    const items = name.map((itemName, id) => ({
+        name: itemName,
+        category: category.values[category.codes[id]],
+        unit: unit.values[unit.codes[id]],
+        image: images[id],
+        price: price[id],
+        // Retailer; catalogs written before multi-source scraping have no column
+        ...(source && { source: source.values[source.codes[id]] })
+    }));
+
+    const index = new Map();
+    Object.entries(catalog.tokens).forEach(([token, deltas]) => {
+        const ids = new Array(deltas.length);
+        let id = 0;
+        for (let i = 0; i < deltas.length; i++) {
+            id += deltas[i];
+            ids[i] = id;
+        }
+        index.set(token, ids);
+    });
+
+    // Category tokens: every product of a category gets the tokens of the category name
+    const idsByCategory = category.values.map(() => []);
+    category.codes.forEach((code, id) => idsByCategory[code].push(id));
+    category.values.forEach((value, code) => {
+        new Set(tokenize(value)).forEach(token => {
+            const merged = new Set([...(index.get(token) || []), ...idsByCategory[code]]);
+            index.set(token, [...merged].sort((a, b) => a - b));
+        });
+    });
+
+    // Sorted tokens let search binary-search prefixes
+    const tokens = [...index.keys()].sort();
+    const postings = tokens.map(token => index.get(token));
+
+    return { items, tokenIndex: { tokens, postings } };
+};
+
+/**
+ * Returns the ids of products having a token that starts with `prefix`.
+ */
+export const lookupPrefix = (tokenIndex, prefix) => {
+    const { tokens, postings } = tokenIndex;
+    let lo = 0;
+    let hi = tokens.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (tokens[mid] < prefix) lo = mid + 1;
+        else hi = mid;
+    }
+
+    const ids = new Set();
+    for (let i = lo; i < tokens.length && tokens[i].startsWith(prefix); i++) {
+        postings[i].forEach(id => ids.add(id));
+    }
+    return ids;
+};
@@ -0,0 +1,78 @@
+import { DATA_BASE_URL } from '../config';
+
+/**
+ * Resolves data files through the published `data/latest.json` pointer.
+ *
+ * The pipeline copies every partition, the manifest and derived artifacts
+ * (meta.json, ...) to content-addressed names under `data/immutable/`. Those
+ * files never change, so they are fetched with `force-cache`; only the tiny
+ * pointer is revalidated on every load. Older data branches have no pointer,
+ * in which case callers fall back to the mutable paths.
+ */
+let latestPromise = null;
+
+export const dataUrl = (path) => `${DATA_BASE_URL}/data/${path}`;
+
+export const loadLatest = () => {
+    if (!latestPromise) {
+        latestPromise = fetch(dataUrl('latest.json'), { cache: 'no-cache' })
+            .then(res => (res.ok ? res.json() : null))
+            .catch(() => null);
+    }
+    return latestPromise;
+};
+
+/**
+ * Fetches a published artifact by name (e.g. "meta"), falling back to its
+ * mutable path when there is no pointer or the artifact is not listed.
+ */
+export const fetchArtifact = async (name, fallbackPath) => {
+    const latest = await loadLatest();
+    const objectPath = latest?.artifacts?.[name];
+    if (objectPath) {
+        return fetch(dataUrl(objectPath), { cache: 'force-cache' });
+    }
+    return fetch(dataUrl(fallbackPath));
+};
+
+const withPartitionUrls = (manifest) => ({
+    ...manifest,
+    partitions: manifest.partitions.map(part => ({
+        ...part,
+        url: part.object ? dataUrl(part.object) : `${dataUrl(part.path)}?v=${part.sha256.slice(0, 16)}`,
+        cache: 'force-cache'
+    }))
+});
+
+/**
+ * Loads the partition manifest. Each partition gets a `url` and a fetch
+ * `cache` mode: immutable objects when published, hash-busted paths otherwise.
+ */
+export const loadManifest = async () => {
+    const latest = await loadLatest();
+    const response = latest?.manifest
+        ? await fetch(dataUrl(latest.manifest), { cache: 'force-cache' })
+        : await fetch(dataUrl('manifest.json'), { cache: 'no-cache' });
+    if (!response.ok) return null;
+    return withPartitionUrls(await response.json());
+};
+
+/**
+ * Loads the manifest of a derived partitioned dataset by name (e.g.
+ * "lttb_week"), falling back to its mutable path. Resolves to null when the
+ * data branch does not have it.
+ */
+export const loadDataset = async (name, fallbackPath) => {
+    const latest = await loadLatest();
+    const objectPath = latest?.datasets?.[name];
+    try {
+        const response = objectPath
+            ? await fetch(dataUrl(objectPath), { cache: 'force-cache' })
+            : await fetch(dataUrl(fallbackPath), { cache: 'no-cache' });
+        if (!response.ok) return null;
+        return withPartitionUrls(await response.json());
+    } catch (err) {
+        console.warn(`Failed to load dataset ${name}`, err);
+        return null;
+    }
+};